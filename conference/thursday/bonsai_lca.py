@@ -0,0 +1,128 @@
+'''
+Batch LCA over the BONSAI matrices with one factorisation of the technosphere.
+
+The technosphere matrix A is LU-factorised once with scipy's splu. The
+scores of many final demand vectors are computed from one transposed solve per
+impact category: with the characterized intensities of the activities
+Y = A^-T (C B)^T, the scores of the demands D are D^T Y. The contributions by
+elementary flow and by location need the supply vectors X = A^-1 D, which are
+solved in chunks of demands with the same factorisation.
+
+    bonsai = BonsaiMatrices.load('bonsai_files')
+    lca = BatchLCA(bonsai, {'GWP100': {'Carbon_dioxide__fossil_Air': 1, ...}})
+    demands = lca.demands(bonsai.find(name='final consumption expenditure by households')['key'])
+    scores = lca.scores(demands)                 # demands x categories
+    by_location = lca.contributions(demands, 'GWP100', by='location')
+'''
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+
+class BatchLCA:
+    '''Leontief solver of many final demands over BonsaiMatrices.
+
+    Args:
+        matrices: BonsaiMatrices.
+        characterization: dict of impact category and dict of elementary flow code
+            (row_code of the extension table) and characterization factor.
+    '''
+    def __init__(self, matrices, characterization):
+        self.matrices = matrices
+        self.categories = list(characterization)
+        flows = {code: i for i, code in enumerate(matrices.flows)}
+        self.C = np.zeros((len(self.categories), len(flows)))
+        for i, factors in enumerate(characterization.values()):
+            for code, factor in factors.items():
+                if code in flows:
+                    self.C[i, flows[code]] = factor
+        self.B = matrices.extensions.tocsr()
+        self._lu = splu(sparse.csc_matrix(matrices.technosphere))
+        self._intensities = None
+
+    @classmethod
+    def from_method(cls, matrices, methods, mapping, biosphere=None):
+        '''Characterization from brightway LCIA methods.
+
+        Args:
+            methods: list of brightway method tuples, used as impact categories.
+            mapping: dict of elementary flow code of the extension table and code of the biosphere flow,
+                e.g. map_bonsai_b3 of import_bonsai.ipynb.
+            biosphere: name of the biosphere database, default is bd.config.biosphere.
+        '''
+        import bw2data as bd
+
+        biosphere = bd.config.biosphere if biosphere is None else biosphere
+        ids = {code: bd.get_node(database=biosphere, code=bio_code).id for code, bio_code in mapping.items()}
+        characterization = {}
+        for method in methods:
+            cfs = dict(bd.Method(method).load())
+            characterization[method] = {code: cfs.get(node_id, 0) for code, node_id in ids.items()}
+        return cls(matrices, characterization)
+
+    def demands(self, keys, amounts=1):
+        '''Sparse demand matrix (activities x demands) of unit or given amounts of the activity keys.'''
+        keys = list(keys)
+        rows = [self.matrices.index(key) for key in keys]
+        data = np.broadcast_to(np.asarray(amounts, dtype=float), len(keys))
+        return sparse.csc_matrix((data, (rows, np.arange(len(keys)))), shape=(len(self.matrices), len(keys)))
+
+    @property
+    def intensities(self):
+        '''Impact of one unit of final demand of every activity, activities x categories.'''
+        if self._intensities is None:
+            direct = (self.B.T @ self.C.T) # activities x categories, characterized direct emissions
+            self._intensities = self._lu.solve(np.ascontiguousarray(direct), trans='T')
+        return self._intensities
+
+    def scores(self, demands, names=None):
+        '''Scores of the demands (activities x demands) as DataFrame demands x categories.'''
+        scores = np.asarray(sparse.csc_matrix(demands).T @ self.intensities)
+        if names is None:
+            names = self._demand_names(demands)
+        return pd.DataFrame(scores, index=names, columns=self.categories)
+
+    def _demand_names(self, demands):
+        demands = sparse.csc_matrix(demands)
+        names = []
+        for j in range(demands.shape[1]):
+            rows = demands.indices[demands.indptr[j]:demands.indptr[j + 1]]
+            names.append(self.matrices.activities['key'].iloc[rows[0]] if len(rows) == 1 else j)
+        return names
+
+    def supply(self, demands, chunksize=64):
+        '''Yield the first demand index and the supply vectors (activities x chunk) of chunks of demands.'''
+        demands = sparse.csc_matrix(demands)
+        for start in range(0, demands.shape[1], chunksize):
+            rhs = demands[:, start:start + chunksize].toarray()
+            yield start, self._lu.solve(rhs)
+
+    def contributions(self, demands, category, by='flow', chunksize=64, names=None):
+        '''Contributions to the scores of the demands in category.
+
+        Args:
+            demands: demand matrix, activities x demands.
+            category: impact category.
+            by: 'flow' for the elementary flows or 'location' for the location of the emitting activities.
+            chunksize: demands solved at once.
+
+        Returns:
+            DataFrame of the contributions, index are the flows or locations, columns the demands.
+        '''
+        c = self.C[self.categories.index(category)]
+        direct = self.B.T @ c # characterized direct emissions per unit of activity
+        locations = self.matrices.activities['location'].to_numpy()
+        parts = []
+        for _, supply in self.supply(demands, chunksize):
+            if by == 'flow':
+                parts.append(c[:, None] * (self.B @ supply))
+            elif by == 'location':
+                frame = pd.DataFrame(direct[:, None] * supply)
+                parts.append(frame.groupby(locations).sum().to_numpy())
+            else:
+                raise ValueError(f"by must be 'flow' or 'location', not {by}.")
+        index = self.matrices.flows if by == 'flow' else np.unique(locations)
+        if names is None:
+            names = self._demand_names(demands)
+        return pd.DataFrame(np.hstack(parts), index=index, columns=names)
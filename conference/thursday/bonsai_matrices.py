@@ -0,0 +1,188 @@
+'''
+Sparse matrices of the BONSAI IO tables in bonsai_files, cached for repeated LCA.
+
+The gzipped value tables are (row, col, amount) triplets referring to the
+positions in the index tables:
+
+    product_value_table.gzip     technosphere matrix, rows are products and
+                                 columns activities of index_table_hiot.gzip
+    extensions_value_table.gzip  extension matrix, rows are the elementary
+                                 flows of index_table_extensions.gzip
+
+As in the BonsaiImporter, the product table is used as technosphere matrix
+as it is (production on the diagonal, inputs negative). Activities and
+products are keyed by 'code|region', names and units come from
+io_metadata.json.
+
+The tables are parsed once in chunks and the CSR arrays and index columns are
+cached as .npy files in the cache directory. Later sessions load them memory
+mapped. The cache is rebuilt if the size or modification time of a source
+file changed.
+
+    bonsai = BonsaiMatrices.load('bonsai_files')
+    bonsai.technosphere, bonsai.extensions, bonsai.activity('A_Juice_appl_con|CH')
+'''
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+CACHE_VERSION = 1
+SOURCE_FILES = [
+    'product_value_table.gzip',
+    'extensions_value_table.gzip',
+    'index_table_hiot.gzip',
+    'index_table_extensions.gzip',
+    'io_metadata.json',
+    ]
+MATRICES = ['technosphere', 'extensions']
+INDEX_COLUMNS = ['key', 'code', 'location', 'name', 'unit', 'product_key', 'product_name']
+
+
+def _read_triplets(path, shape, chunksize):
+    # stream the gzipped triplet table and build the CSR matrix
+    rows, cols, amounts = [], [], []
+    for chunk in pd.read_csv(path, compression='gzip', chunksize=chunksize,
+                             dtype={'row': np.int64, 'col': np.int64, 'amount': np.float64}):
+        rows.append(chunk['row'].to_numpy())
+        cols.append(chunk['col'].to_numpy())
+        amounts.append(chunk['amount'].to_numpy())
+    if not rows:
+        return sparse.csr_matrix(shape)
+    matrix = sparse.coo_matrix((np.concatenate(amounts), (np.concatenate(rows), np.concatenate(cols))), shape=shape)
+    return matrix.tocsr()
+
+
+def _sources(dirpath):
+    sources = {}
+    for name in SOURCE_FILES:
+        stat = (Path(dirpath) / name).stat()
+        sources[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return sources
+
+
+class BonsaiMatrices:
+    '''Technosphere and extension matrix of the BONSAI IO tables.
+
+    Attributes:
+        technosphere: CSR matrix, products x activities.
+        extensions: CSR matrix, elementary flows x activities.
+        activities: DataFrame with one row per activity and the columns INDEX_COLUMNS.
+            Row i is column i of the matrices and its product is row i of the technosphere.
+        flows: array of the elementary flow codes, rows of the extension matrix.
+    '''
+    def __init__(self, technosphere, extensions, activities, flows):
+        self.technosphere = technosphere
+        self.extensions = extensions
+        self.activities = activities
+        self.flows = np.asarray(flows)
+        self._index = {key: i for i, key in enumerate(activities['key'])}
+
+    def __len__(self):
+        return len(self.activities)
+
+    def index(self, key):
+        '''Matrix index of the activity key 'code|region'.'''
+        return self._index[key]
+
+    def activity(self, key):
+        '''Index row of the activity key 'code|region' as dict.'''
+        return self.activities.iloc[self._index[key]].to_dict()
+
+    def find(self, name=None, location=None):
+        '''Activities with the name (exact) and location, like Database.get(name=..., location=...).'''
+        mask = np.ones(len(self.activities), dtype=bool)
+        if name is not None:
+            mask &= (self.activities['name'] == name).to_numpy()
+        if location is not None:
+            mask &= (self.activities['location'] == location).to_numpy()
+        return self.activities[mask]
+
+    @classmethod
+    def build(cls, dirpath, chunksize=1_000_000):
+        '''Parse the BONSAI tables in dirpath.'''
+        dirpath = Path(dirpath)
+        with open(dirpath / 'io_metadata.json') as f:
+            metadata = json.load(f)
+        hiot = pd.read_csv(dirpath / 'index_table_hiot.gzip', compression='gzip', dtype=str)
+        flows = pd.read_csv(dirpath / 'index_table_extensions.gzip', compression='gzip', dtype=str)['row_code']
+
+        def meta(code, field):
+            return metadata.get(code, {}).get(field, code)
+
+        activities = pd.DataFrame({
+            'key': hiot['col_code'] + '|' + hiot['col_region'],
+            'code': hiot['col_code'],
+            'location': hiot['col_region'],
+            'name': [meta(code, 'name') for code in hiot['col_code']],
+            'unit': [meta(code, 'unit') for code in hiot['row_code']],
+            'product_key': hiot['row_code'] + '|' + hiot['row_region'],
+            'product_name': [meta(code, 'name') for code in hiot['row_code']],
+            })
+        n = len(activities)
+        technosphere = _read_triplets(dirpath / 'product_value_table.gzip', (n, n), chunksize)
+        extensions = _read_triplets(dirpath / 'extensions_value_table.gzip', (len(flows), n), chunksize)
+        return cls(technosphere, extensions, activities, flows.to_numpy())
+
+    def save(self, cache_dir, sources=None):
+        '''Write the matrices and index as .npy files to cache_dir. The manifest is written last.'''
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        shapes = {}
+        for name in MATRICES:
+            matrix = getattr(self, name)
+            shapes[name] = matrix.shape
+            for part in ['data', 'indices', 'indptr']:
+                np.save(cache_dir / f'{name}_{part}.npy', getattr(matrix, part))
+        for column in INDEX_COLUMNS:
+            np.save(cache_dir / f'activities_{column}.npy', self.activities[column].to_numpy(dtype=str))
+        np.save(cache_dir / 'flows.npy', self.flows.astype(str))
+        manifest = {'cache_version': CACHE_VERSION, 'shapes': shapes, 'sources': sources}
+        tmp = cache_dir / 'manifest.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, cache_dir / 'manifest.json')
+
+    @classmethod
+    def from_cache(cls, cache_dir, mmap_mode='r'):
+        '''Load cached matrices memory mapped.'''
+        cache_dir = Path(cache_dir)
+        with open(cache_dir / 'manifest.json') as f:
+            manifest = json.load(f)
+        matrices = {}
+        for name in MATRICES:
+            parts = [np.load(cache_dir / f'{name}_{part}.npy', mmap_mode=mmap_mode)
+                     for part in ['data', 'indices', 'indptr']]
+            matrices[name] = sparse.csr_matrix(tuple(parts), shape=tuple(manifest['shapes'][name]), copy=False)
+        activities = pd.DataFrame({column: np.load(cache_dir / f'activities_{column}.npy')
+                                   for column in INDEX_COLUMNS})
+        flows = np.load(cache_dir / 'flows.npy')
+        return cls(matrices['technosphere'], matrices['extensions'], activities, flows)
+
+    @staticmethod
+    def cache_valid(dirpath, cache_dir):
+        '''True, if cache_dir holds a complete cache of the current source files in dirpath.'''
+        try:
+            with open(Path(cache_dir) / 'manifest.json') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        return manifest.get('cache_version') == CACHE_VERSION and manifest.get('sources') == _sources(dirpath)
+
+    @classmethod
+    def load(cls, dirpath, cache_dir=None, chunksize=1_000_000):
+        '''Load the BONSAI matrices from the cache or parse and cache them.
+
+        Args:
+            dirpath: directory of the BONSAI files.
+            cache_dir: directory of the cache, default is dirpath/.matrix_cache.
+            chunksize: rows per chunk of the CSV parser.
+        '''
+        cache_dir = Path(dirpath) / '.matrix_cache' if cache_dir is None else Path(cache_dir)
+        if not cls.cache_valid(dirpath, cache_dir):
+            sources = _sources(dirpath)
+            cls.build(dirpath, chunksize).save(cache_dir, sources)
+        return cls.from_cache(cache_dir)
@@ -0,0 +1,205 @@
+'''
+In-memory index of brightway activities for fast dataset lookup.
+
+The index holds name, location, reference product, unit and code of all
+activities of the indexed databases. It answers exact, substring and prefix
+queries without iterating over the database. It is saved as npz next to the
+'modified' timestamps of the databases and is rebuilt when one of them
+changed.
+
+link_defaults() uses the index to link the flows of a SiModIn model: flows
+with default_name get the best matching activity, biosphere flows with
+default_code get the flow with this code.
+
+    index = ActivityIndex.load(['ecoinvent-3.11-cutoff', 'ecoinvent-3.11-biosphere'], 'activity_index.npz')
+    index.get(name='heat production, natural gas, at industrial furnace >100kW',
+              location='Europe without Switzerland')
+    link_defaults(my_interface, index, locations=['DE', 'Europe without Switzerland'])
+
+steam_net.link_defaults() loads the index and links its own flows in one call.
+'''
+import json
+import zipfile
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+INDEX_FIELDS = ['name', 'location', 'reference product', 'unit', 'code']
+# locations tried after the passed locations, in this order:
+DEFAULT_LOCATIONS = ['GLO', 'RER', 'Europe without Switzerland', 'RoW']
+
+
+class ActivityIndex:
+    '''Index of the activities of brightway databases.
+
+    Args:
+        table: DataFrame with the columns id, database and INDEX_FIELDS.
+        modified: dict of database name and its 'modified' timestamp at the time of indexing.
+    '''
+    def __init__(self, table, modified):
+        self.table = table.reset_index(drop=True)
+        self.modified = modified
+        self._exact = {field: self.table.groupby(field).indices for field in INDEX_FIELDS}
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def build(cls, databases):
+        '''Index the activities of the databases from the activity table of the project.'''
+        import bw2data as bd
+        from bw2data.backends.schema import ActivityDataset as AD
+
+        rows = []
+        for database in databases:
+            query = AD.select(AD.id, AD.database, AD.code, AD.name, AD.location, AD.product, AD.data).where(
+                AD.database == database)
+            for row in query:
+                rows.append((row.id, row.database, row.name or '', row.location or '', row.product or '',
+                             row.data.get('unit') or '', row.code))
+        table = pd.DataFrame(rows, columns=['id', 'database'] + INDEX_FIELDS)
+        return cls(table, {database: bd.databases[database].get('modified') for database in databases})
+
+    def valid(self):
+        '''True, if no indexed database was modified since indexing.'''
+        import bw2data as bd
+
+        return all(database in bd.databases and bd.databases[database].get('modified') == modified
+                   for database, modified in self.modified.items())
+
+    def save(self, path):
+        columns = {f'col_{field}': self.table[field].to_numpy(dtype=str) for field in ['database'] + INDEX_FIELDS}
+        np.savez(path, id=self.table['id'].to_numpy(dtype=np.int64), modified=json.dumps(self.modified), **columns)
+
+    @classmethod
+    def from_file(cls, path):
+        with np.load(path) as data:
+            table = pd.DataFrame({field: data[f'col_{field}'] for field in ['database'] + INDEX_FIELDS})
+            table.insert(0, 'id', data['id'])
+            modified = json.loads(str(data['modified']))
+        return cls(table, modified)
+
+    @classmethod
+    def load(cls, databases, path=None):
+        '''Load the index of the databases from path or build and save it, if it is missing or outdated.'''
+        if path is not None:
+            try:
+                index = cls.from_file(path)
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                # missing, corrupt or saved in an older format, rebuilt below
+                pass
+            else:
+                if set(index.modified) == set(databases) and index.valid():
+                    return index
+        index = cls.build(databases)
+        if path is not None:
+            index.save(path)
+        return index
+
+    def _prefix(self, field, prefix):
+        # positions of the values starting with prefix, from the sorted values of the field
+        if field not in self._sorted:
+            order = np.argsort(self.table[field].to_numpy(dtype=str), kind='stable')
+            self._sorted[field] = (order, self.table[field].to_numpy(dtype=str)[order].tolist())
+        order, values = self._sorted[field]
+        start = bisect_left(values, prefix)
+        end = start
+        while end < len(values) and values[end].startswith(prefix):
+            end += 1
+        return order[start:end]
+
+    def query(self, mode='exact', database=None, **fields):
+        '''Activities matching all fields.
+
+        Args:
+            mode: 'exact', 'contains' (substring) or 'prefix' match of the field values.
+            database: restrict the result to this database.
+            **fields: field values, use reference_product for 'reference product'.
+
+        Returns:
+            DataFrame of the matching rows of the index.
+        '''
+        rows = None
+        for field, value in fields.items():
+            field = field.replace('_', ' ') if field == 'reference_product' else field
+            if field not in INDEX_FIELDS:
+                raise ValueError(f'{field} is not indexed, use one of {INDEX_FIELDS}.')
+            if mode == 'exact':
+                found = self._exact[field].get(value, np.array([], dtype=int))
+            elif mode == 'prefix':
+                found = self._prefix(field, value)
+            elif mode == 'contains':
+                found = np.flatnonzero(self.table[field].str.contains(value, regex=False).to_numpy())
+            else:
+                raise ValueError(f"mode must be 'exact', 'contains' or 'prefix', not {mode}.")
+            rows = set(found.tolist()) if rows is None else rows & set(found.tolist())
+        result = self.table if rows is None else self.table.iloc[sorted(rows)]
+        if database is not None:
+            result = result[result['database'] == database]
+        return result
+
+    def get(self, mode='exact', database=None, **fields):
+        '''Single brightway node matching the fields, like Database.get(name=..., location=...).
+
+        Raises:
+            KeyError: if no or more than one activity matches.
+        '''
+        import bw2data as bd
+
+        result = self.query(mode, database, **fields)
+        if len(result) != 1:
+            raise KeyError(f'{len(result)} activities match {fields}.')
+        return bd.get_node(id=int(result['id'].iloc[0]))
+
+    def best(self, name, locations=(), database=None):
+        '''
+        Best match of name: exact matches before prefix matches, then by the order of locations
+        and DEFAULT_LOCATIONS and the shortest name. Returns the brightway node or None.
+        '''
+        import bw2data as bd
+
+        ranking = list(locations) + [loc for loc in DEFAULT_LOCATIONS if loc not in locations]
+        for mode in ['exact', 'prefix']:
+            result = self.query(mode, database, name=name)
+            if result.empty:
+                continue
+            rank = result['location'].map(lambda loc: ranking.index(loc) if loc in ranking else len(ranking))
+            result = result.assign(_rank=rank, _length=result['name'].str.len()).sort_values(['_rank', '_length'])
+            return bd.get_node(id=int(result['id'].iloc[0]))
+        return None
+
+
+def link_defaults(interface, index, locations=(), database=None, overwrite=False):
+    '''Link the flows of interface.model to the activities given by their default_name and default_code.
+
+    Args:
+        interface: simodin modelInterface.
+        index: ActivityIndex of the databases to link against.
+        locations: preferred locations of the linked activities.
+        database: restrict the technosphere matches to this database.
+        overwrite: also link flows, which are already linked.
+
+    Returns:
+        dict of flow name and linked node, None for flows without a match.
+    '''
+    from .bw_link import linked_dataset
+
+    import bw2data as bd
+
+    model = interface.model
+    linked = {}
+    for name, ex in (model._technosphere | model._biosphere).items():
+        if getattr(ex, 'functional', False) or (not overwrite and linked_dataset(model, ex) is not None):
+            continue
+        node = None
+        if ex.default_code:
+            codes = index.query(code=ex.default_code)
+            node = bd.get_node(id=int(codes['id'].iloc[0])) if len(codes) else None
+        if node is None and ex.default_name:
+            node = index.best(ex.default_name, locations, database)
+        if node is not None:
+            interface.add_dataset(name, node)
+        linked[name] = node
+    return linked
@@ -0,0 +1,181 @@
+'''
+Asyncio API for concurrent steam net evaluations.
+
+AsyncSteamNet keeps a bounded pool of worker processes. Every worker owns its
+own model instance and networks, so concurrent requests never share a TESPy
+network. A request waits for an idle worker, which solves the parameter set
+like a sweep point. If a request is cancelled or exceeds its timeout, its
+worker process is terminated and replaced, so runaway solves do not block
+the pool. Starting, killing and joining worker processes runs in threads, so
+it never blocks the event loop.
+
+    async with AsyncSteamNet(steam_net, max_workers=4, timeout=60) as pool:
+        tasks = [pool.submit(needed_temperature=t) for t in range(150, 250, 5)]
+        results = await asyncio.gather(*tasks)
+'''
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .sweep import RESULT_COLUMNS, _init_worker, _solve_point
+
+
+class SteamNetResult:
+    '''Result of one evaluation.
+
+    Attributes:
+        params: evaluated parameters.
+        factors: dict of the result factors of steam_net._result().
+        flows: dict of the flow amounts.
+        converged: converged flag.
+        topology: topology of the solved network.
+        error: error message of failed evaluations.
+    '''
+    def __init__(self, params, row):
+        self.params = params
+        self.factors = {col: row[col] for col in RESULT_COLUMNS}
+        self.converged = row['converged']
+        self.topology = row['topology']
+        self.error = row['error']
+        skip = set(RESULT_COLUMNS) | {'index', 'converged', 'topology', 'error'} | set(params)
+        self.flows = {key: value for key, value in row.items() if key not in skip}
+
+    def __repr__(self):
+        return f'SteamNetResult(params={self.params}, converged={self.converged}, factors={self.factors})'
+
+
+def _worker_main(conn, model_cls, name, base_params):
+    _init_worker(None)
+    while True:
+        params = conn.recv()
+        if params is None:
+            break
+        conn.send(_solve_point(model_cls, name, base_params, 0, params))
+
+
+class _Worker:
+    def __init__(self, ctx, model_cls, name, base_params):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, model_cls, name, base_params), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class AsyncSteamNet:
+    '''Bounded pool of steam net worker processes for asyncio.
+
+    Args:
+        model_cls: SimModel class, e.g. steam_net.
+        base_params: parameters passed to init_model() of the worker models.
+        name: model name of the worker models.
+        max_workers: number of worker processes, default is the number of cpus.
+        timeout: default timeout in seconds of a single evaluation, None for no timeout.
+    '''
+    def __init__(self, model_cls, base_params=None, name='steam net', max_workers=None, timeout=None):
+        self.model_cls = model_cls
+        self.base_params = base_params or {}
+        self.name = name
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context('spawn')
+        self._idle = None
+        self._workers = set()
+        self._replacing = set()
+        self._threads = None
+
+    def _new_worker(self):
+        return _Worker(self._ctx, self.model_cls, self.name, self.base_params)
+
+    def _respawn(self, worker):
+        # blocking, runs in the thread pool: join the killed process and start a new one
+        worker.kill()
+        return self._new_worker()
+
+    async def _replace(self, worker):
+        loop = asyncio.get_running_loop()
+        self._workers.discard(worker)
+        new = await loop.run_in_executor(self._threads, self._respawn, worker)
+        self._workers.add(new)
+        self._idle.put_nowait(new)
+
+    async def start(self):
+        # threads wait for the worker pipes and start, kill and join worker processes
+        self._threads = ThreadPoolExecutor(max_workers=2 * self.max_workers)
+        self._idle = asyncio.Queue()
+        self._replacing = set()
+        loop = asyncio.get_running_loop()
+        workers = await asyncio.gather(*(loop.run_in_executor(self._threads, self._new_worker)
+                                         for _ in range(self.max_workers)))
+        for worker in workers:
+            self._workers.add(worker)
+            self._idle.put_nowait(worker)
+        return self
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*self._replacing, return_exceptions=True)
+        await asyncio.gather(*(loop.run_in_executor(self._threads, worker.close) for worker in self._workers))
+        self._workers.clear()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def evaluate(self, timeout=None, **params):
+        '''Solve the model for params in an idle worker.
+
+        Args:
+            timeout: timeout in seconds, default is the timeout of the pool.
+            **params: model parameters of this evaluation.
+
+        Returns:
+            SteamNetResult
+
+        Raises:
+            asyncio.TimeoutError: if the solve exceeds the timeout. The worker is replaced in the
+                background, the other evaluations continue meanwhile.
+        '''
+        if self._idle is None:
+            raise RuntimeError('AsyncSteamNet is not started, use "async with" or await start().')
+        timeout = self.timeout if timeout is None else timeout
+        worker = await self._idle.get()
+        loop = asyncio.get_running_loop()
+        try:
+            worker.conn.send(params)
+            row = await asyncio.wait_for(loop.run_in_executor(self._threads, worker.conn.recv), timeout)
+        except BaseException:
+            # cancelled, timed out or crashed: the worker state is unknown, replace it in the background
+            task = asyncio.ensure_future(self._replace(worker))
+            self._replacing.add(task)
+            task.add_done_callback(self._replacing.discard)
+            raise
+        self._idle.put_nowait(worker)
+        return SteamNetResult(params, row)
+
+    def submit(self, timeout=None, **params):
+        '''Schedule an evaluation and return it as asyncio.Task.'''
+        return asyncio.ensure_future(self.evaluate(timeout, **params))
+
+    async def map(self, points, timeout=None):
+        '''Evaluate all parameter dicts of points concurrently and return the results in order.
+        Failed or timed out evaluations are returned as exceptions.'''
+        return await asyncio.gather(*(self.evaluate(timeout, **p) for p in points), return_exceptions=True)
@@ -0,0 +1,238 @@
+'''
+Benchmarks of the steam net model.
+
+Times the cold network build (create_steam_net), the warm recalculation and
+the evaluation of the flow amounts over a fixed parameter grid, and the build
+of each topology branch (plain, cond_inj, trap) at its point of
+steam_network_model.TOPOLOGY_POINTS. Besides the wall times, the Newton
+iterations of all solves (from the solver instrumentation) are recorded. The peak Python memory of every case is
+measured in a separate untimed pass. The results are written as JSON together
+with the versions of TESPy and CoolProp and can be compared between runs:
+
+    python -m steam_net.benchmark --output bench.json
+    python -m steam_net.benchmark --output bench_new.json --compare bench.json
+'''
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from importlib import metadata
+
+from tespy.networks import Network
+
+from . import steam_network_model as snwm
+from .steam_net_interface import steam_net
+from .steam_network_model import MODEL_VERSION, TOPOLOGY_POINTS
+from .sweep import parameter_grid
+
+GRID = {
+    'needed_temperature': [150, 200, 230, 250],
+    'pipe_length': [500, 1000, 2000],
+    'insulation_thickness': [0.05, 0.1],
+    }
+FLOW_REPEAT = 100
+REPEAT = 5
+
+
+class _Case:
+    def __init__(self):
+        self.times = []
+        self.iterations = []
+        self.failures = 0
+        self.peak_memory = None
+
+    def run(self, func):
+        start = time.perf_counter()
+        try:
+            iterations = func()
+        except Exception:
+            self.failures += 1
+        else:
+            self.times.append(time.perf_counter() - start)
+            if iterations is not None:
+                self.iterations.append(iterations)
+
+    def measure_memory(self, func):
+        # separate untimed pass, tracemalloc slows down the traced calls considerably
+        tracemalloc.start()
+        try:
+            func()
+        except Exception:
+            pass
+        finally:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.peak_memory = max(self.peak_memory or 0, peak)
+
+    def summary(self):
+        return {
+            'n': len(self.times),
+            'failures': self.failures,
+            'mean_s': statistics.fmean(self.times) if self.times else None,
+            'median_s': statistics.median(self.times) if self.times else None,
+            'min_s': min(self.times, default=None),
+            'max_s': max(self.times, default=None),
+            'iterations_mean': statistics.fmean(self.iterations) if self.iterations else None,
+            'peak_memory_mb': None if self.peak_memory is None else self.peak_memory / 1E6,
+            }
+
+
+def _iterations(model):
+    iterations = sum(r.get('iterations', 0) for r in model.instrumentation.records)
+    model.instrumentation.clear()
+    return iterations
+
+
+def _cold_model():
+    model = steam_net('steam net')
+    model.init_model()
+    model.instrument()
+    return model
+
+
+def _build_topology(topology, point):
+    # build and solve the network of the topology branch directly, like calculate_model() with a known topology
+    model = _cold_model()
+    model.params |= point
+    model._calc_mains()
+    model.model = Network()
+    snwm.create_steam_net(model, topology)
+    if not model.model.converged:
+        raise RuntimeError(f'The {topology} network did not converge.')
+    # the plain network is never selected by detection, its point is only checked for convergence
+    if topology != 'plain' and snwm.classify_topology(model.model.get_conn('c022').x.val) != topology:
+        raise RuntimeError(f'{point} does not belong to the {topology} topology.')
+    return _iterations(model)
+
+
+def run_benchmarks(grid=GRID, flow_repeat=FLOW_REPEAT, topology_points=TOPOLOGY_POINTS, repeat=REPEAT):
+    '''Run all benchmark cases over the parameter grid.
+
+    Args:
+        grid: parameter grid of the cold build, warm recalculation and flow evaluation cases.
+        flow_repeat: flow evaluations per timed call.
+        topology_points: parameter sets of the topology branch cases.
+        repeat: timed builds per topology branch.
+
+    Returns:
+        dict with the metadata of the run and a summary per case.
+
+    Raises:
+        RuntimeError: if a topology case has no successful sample.
+    '''
+    points = parameter_grid(**grid).to_dict('records')
+    cases = {name: _Case() for name in [
+        'cold_build', 'warm_recalculation', 'flow_evaluation'] + [f'build_{t}' for t in topology_points]}
+
+    warm = _cold_model()
+    warm.calculate_model(**points[0])
+    warm.define_flows()
+
+    for point in points:
+        model = _cold_model()
+
+        def cold():
+            model.calculate_model(**point)
+            return _iterations(model)
+        cases['cold_build'].run(cold)
+
+        def recalc():
+            warm.instrumentation.clear()
+            warm.recalculate_model(**point)
+            return _iterations(warm)
+        cases['warm_recalculation'].run(recalc)
+
+        def flows():
+            for _ in range(flow_repeat):
+                warm.flow_amounts()
+        cases['flow_evaluation'].run(flows)
+
+    for topology, point in topology_points.items():
+        case = cases[f'build_{topology}']
+        for _ in range(repeat):
+            case.run(lambda: _build_topology(topology, point))
+        if not case.times:
+            raise RuntimeError(f'No successful sample of the {topology} topology at {point}.')
+
+    # peak memory of the first point, untimed:
+    cases['cold_build'].measure_memory(lambda: _cold_model().calculate_model(**points[0]))
+    cases['warm_recalculation'].measure_memory(lambda: warm.recalculate_model(**points[0]))
+    cases['flow_evaluation'].measure_memory(lambda: [warm.flow_amounts() for _ in range(flow_repeat)])
+    for topology, point in topology_points.items():
+        cases[f'build_{topology}'].measure_memory(lambda: _build_topology(topology, point))
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'model_version': MODEL_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'tespy': metadata.version('tespy'),
+            'coolprop': metadata.version('coolprop'),
+            'grid': grid,
+            'flow_repeat': flow_repeat,
+            'topology_points': topology_points,
+            'repeat': repeat,
+            },
+        'cases': {name: case.summary() for name, case in cases.items()},
+        }
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=0.1):
+    '''Compare the median times of two benchmark results.
+
+    Args:
+        old, new: benchmark result dicts or paths of their JSON files.
+        threshold: relative slow down, which is flagged as regression.
+
+    Returns:
+        dict per case with both medians, their ratio and the regression flag.
+    '''
+    old, new = (_load(r) if isinstance(r, str) else r for r in (old, new))
+    table = {}
+    for name, case in new['cases'].items():
+        before = old['cases'].get(name, {}).get('median_s')
+        after = case['median_s']
+        ratio = after / before if before and after else None
+        table[name] = {
+            'old_median_s': before,
+            'new_median_s': after,
+            'ratio': ratio,
+            'regression': ratio is not None and ratio > 1 + threshold,
+            }
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the steam net model.')
+    parser.add_argument('--output', default='steam_net_benchmark.json', help='path of the result JSON file')
+    parser.add_argument('--compare', help='path of an earlier result JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slow down flagged as regression')
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks()
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    for name, case in result['cases'].items():
+        print(f"{name:25s} median {case['median_s']} s, iterations {case['iterations_mean']}, "
+              f"peak memory {case['peak_memory_mb']} MB, failures {case['failures']}")
+    if args.compare:
+        regressions = 0
+        for name, row in compare(args.compare, result, args.threshold).items():
+            flag = 'REGRESSION' if row['regression'] else ''
+            regressions += row['regression']
+            print(f"{name:25s} {row['old_median_s']} -> {row['new_median_s']} s {flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
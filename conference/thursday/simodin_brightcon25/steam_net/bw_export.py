@@ -0,0 +1,165 @@
+'''
+Bulk export of steam net variants to brightway.
+
+modelInterface.export_to_bw() writes one dataset per call with a save per
+exchange. export_variants() solves all variants with the sweep, builds every
+activity and exchange in memory and writes them in one go: with
+Database.write() for a new database, otherwise in one sqlite transaction.
+
+The code of a variant dataset is derived from the hash of its parameters
+(params_hash), so a re-export finds the dataset again. Every dataset stores
+the hash of its name, unit and exchanges, with the amounts rounded to
+HASH_DIGITS significant digits. Datasets whose hash did not change are not
+touched.
+'''
+import hashlib
+import json
+
+from .bw_link import linked_dataset, unit_factors
+from .steam_network_model import params_hash
+
+
+def variant_code(params, flow_name):
+    '''Code of the dataset of the functional flow flow_name of the variant params.'''
+    return f'{flow_name}_{params_hash(params)}'
+
+
+# significant digits of the amounts in the exchange hash, repeated solves differ in the last digits
+HASH_DIGITS = 9
+
+
+def _exchange_hash(dataset):
+    exchanges = sorted((list(e['input']), e['type'], float(f"{e['amount']:.{HASH_DIGITS}g}"))
+                       for e in dataset['exchanges'])
+    text = json.dumps([dataset['name'], dataset['unit'], exchanges], default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _datasets(interface, database, params, amounts, factors):
+    # datasets of all functional flows of one variant, like modelInterface.export_to_bw()
+    model = interface.model
+    datasets = {}
+    for fun_name, fun_ex in model._technosphere.items():
+        if not fun_ex.functional:
+            continue
+        reference = amounts[fun_name] * factors[fun_name]
+        exchanges = []
+        for name, ex in model._technosphere.items():
+            dataset = linked_dataset(model, ex)
+            if ex.functional or dataset is None:
+                continue
+            amount = amounts[name] * factors[name] * fun_ex.allocationfactor / reference
+            if ex.dataset_correction is not None:
+                amount *= ex.dataset_correction
+            exchanges.append({'input': dataset.key, 'amount': float(amount), 'type': 'technosphere'})
+        for name, ex in model._biosphere.items():
+            dataset = linked_dataset(model, ex)
+            if dataset is None:
+                continue
+            amount = amounts[name] * factors[name] * fun_ex.allocationfactor / reference
+            exchanges.append({'input': dataset.key, 'amount': float(amount), 'type': 'biosphere'})
+
+        code = variant_code(params, fun_name)
+        exchanges.append({'input': (database, code), 'amount': 1.0, 'type': 'production'})
+        data = {
+            'name': fun_name,
+            'unit': fun_ex.model_unit,
+            'code': code,
+            'database': database,
+            'type': 'process',
+            'exchanges': exchanges,
+            } | {key: value for key, value in params.items()
+                 if key not in ['name', 'unit', 'code', 'database', 'type']}
+        data['params_hash'] = params_hash(params)
+        data['exchange_hash'] = _exchange_hash(data)
+        datasets[(database, code)] = data
+    return datasets
+
+
+def _stored_hashes(database, codes, chunk=500):
+    from bw2data.backends.schema import ActivityDataset
+
+    hashes = {}
+    codes = list(codes)
+    for i in range(0, len(codes), chunk):
+        query = (ActivityDataset
+                 .select(ActivityDataset.code, ActivityDataset.data)
+                 .where((ActivityDataset.database == database) & (ActivityDataset.code << codes[i:i + chunk])))
+        for row in query:
+            hashes[row.code] = row.data.get('exchange_hash')
+    return hashes
+
+
+def _update(database, datasets):
+    # write the datasets into an existing database in one transaction
+    import bw2data as bd
+    from bw2data.backends import sqlite3_lci_db
+    from bw2data.errors import UnknownObject
+
+    with sqlite3_lci_db.atomic():
+        for (_, code), data in datasets.items():
+            try:
+                node = bd.get_node(database=database, code=code)
+            except UnknownObject:
+                node = bd.Database(database).new_node(code=code)
+            else:
+                node.exchanges().delete()
+            for key, value in data.items():
+                if key != 'exchanges':
+                    node[key] = value
+            node.save()
+            for exchange in data['exchanges']:
+                node.new_exchange(input=exchange['input'], amount=exchange['amount'], type=exchange['type']).save()
+
+
+def export_variants(interface, variants, database='simodin_db', max_workers=None):
+    '''Solve and export many parameter variants of interface.model in one brightway write.
+
+    Args:
+        interface: simodin modelInterface of a steam_net model with linked flows. The model must be
+            calculated, its state is used for the unit conversion of the flows.
+        variants: DataFrame, dict of parameter lists (full grid) or iterable of parameter dicts.
+        database: name of the brightway database.
+        max_workers: number of worker processes of the sweep.
+
+    Returns:
+        dict with the codes per variant index, the number of written and unchanged datasets
+        and the indices of the variants which did not converge.
+    '''
+    import bw2data as bd
+
+    model = interface.model
+    interface._get_reference()
+    factors = unit_factors(interface)
+    results = model.sweep(variants, max_workers)
+    flows = list(model._technosphere | model._biosphere)
+    axes = [col for col in results.columns if col in model.params]
+
+    datasets = {}
+    codes = {}
+    failed = []
+    for index, row in results.iterrows():
+        if not row['converged']:
+            failed.append(index)
+            continue
+        # numpy scalars of the table as python values, to get the same hash as a direct calculation
+        params = model.params | {key: getattr(row[key], 'item', lambda: row[key])() for key in axes}
+        variant = _datasets(interface, database, params, {name: row[name] for name in flows}, factors)
+        codes[index] = [code for _, code in variant]
+        datasets |= variant
+
+    if database not in bd.databases:
+        bd.Database(database).write(datasets)
+        written = datasets
+    else:
+        stored = _stored_hashes(database, [code for _, code in datasets])
+        written = {key: data for key, data in datasets.items() if stored.get(key[1]) != data['exchange_hash']}
+        if written:
+            _update(database, written)
+
+    return {
+        'codes': codes,
+        'written': len(written),
+        'unchanged': len(datasets) - len(written),
+        'failed': failed,
+        }
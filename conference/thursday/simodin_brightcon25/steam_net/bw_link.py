@@ -0,0 +1,85 @@
+'''
+Helpers to turn steam net flow amounts into brightway exchange amounts and
+impacts without going through modelInterface one flow at a time.
+
+The conversions follow modelInterface._get_flow_value() and
+modelInterface.calculate_impact() of simodin.
+'''
+
+
+def linked_dataset(model, ex):
+    '''Brightway dataset linked to the flow ex of model or None.'''
+    dataset = ex.source if ex.target == model else ex.target
+    return None if dataset is None or dataset == model else dataset
+
+
+def unit_factor(interface, ex):
+    '''Factor from the model amount of ex to the amount in the dataset unit, based on the current model state.'''
+    amount = ex.amount()
+    magnitude = getattr(amount, 'm', amount)
+    if magnitude == 0:
+        return 1.0
+    return interface._get_flow_value(ex) / magnitude
+
+
+def unit_factors(interface):
+    '''Unit factors of all functional and linked flows of interface.model.'''
+    model = interface.model
+    return {name: unit_factor(interface, ex) for name, ex in (model._technosphere | model._biosphere).items()
+            if getattr(ex, 'functional', False) or linked_dataset(model, ex) is not None}
+
+
+def impact_scores(interface, amounts, factors):
+    '''Impact of a set of flow amounts of interface.model.
+
+    Args:
+        interface: simodin modelInterface with linked datasets and calculated background impact
+            (calculate_background_impact()).
+        amounts: dict of flow name and amount in the units of the flow amount functions.
+        factors: dict of unit factors per flow name, see unit_factor().
+
+    Returns:
+        dict of impact category and impact.
+    '''
+    import bw2data as bd
+
+    model = interface.model
+    impact = {}
+    for cat in interface.method_config['impact_categories']:
+        score = 0
+        for name, ex in model._technosphere.items():
+            if ex.functional or name not in amounts or (cat, name) not in interface.lca.scores:
+                continue
+            value = interface.lca.scores[(cat, name)] * amounts[name] * factors[name]
+            if ex.dataset_correction is not None:
+                value *= ex.dataset_correction
+            score += value
+        cf_list = dict(bd.Method(cat).load()) if model._biosphere else {}
+        for name, ex in model._biosphere.items():
+            dataset = linked_dataset(model, ex)
+            if dataset is not None and name in amounts:
+                score += amounts[name] * factors[name] * cf_list.get(dataset.id, 0)
+        impact[cat] = score
+    return impact
+
+
+def impact_per_unit(interface, amounts, factors=None):
+    '''Impact per unit of the reference flow for a set of flow amounts.
+
+    Args:
+        interface: simodin modelInterface with linked datasets and calculated background impact
+            (calculate_background_impact()).
+        amounts: dict of flow name and amount in the units of the flow amount functions.
+        factors: dict of unit factors per flow name, see unit_factor(). Computed from the current model state if None.
+
+    Returns:
+        dict of impact category and impact per unit of the reference flow.
+    '''
+    model = interface.model
+    interface._get_reference()
+    if factors is None:
+        factors = unit_factors(interface)
+    reference = model._technosphere[interface._reference_flow]
+    ref_amount = amounts[reference.name] * factors[reference.name]
+    return {cat: score * reference.allocationfactor / ref_amount
+            for cat, score in impact_scores(interface, amounts, factors).items()}
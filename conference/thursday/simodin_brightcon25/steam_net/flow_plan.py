@@ -0,0 +1,64 @@
+'''
+Compiled evaluation of the steam net flow amounts.
+
+The flows of steam_net are declared in FLOW_SPECS by the connection label,
+the connection variable, the sign and the factor from the SI value of the
+variable times one second of operation to the unit of the flow. A FlowPlan
+resolves the variable containers of a network once and reads all amounts as
+plain floats from val_SI, without pint arithmetic. The flow amount functions
+of define_flows() are built from the same plan and still return pint
+quantities for simodin.
+'''
+import numpy as np
+
+# flow name: (connection label, variable, sign, factor from SI value * 1 s to unit, unit)
+FLOW_SPECS = {
+    'steam generation': ('e_boil', 'E', 1, 1, 'joule'),
+    'electricity grid': ('e_pump', 'E', 1, 1, 'joule'),
+    'electricity substitution': ('e_turb_grid', 'E', -1, 1, 'joule'),
+    'distributed steam': ('e_heat_sink', 'E', 1, 1E-6, 'megajoule'),
+    'steam leak': ('c_leak', 'm', 1, 1E-3, 'meter ** 3'), # kg -> t, 1 t of water per m3
+    }
+
+
+class FlowPlan:
+    '''Evaluation plan of the flow amounts of FLOW_SPECS.
+
+    Args:
+        specs: dict of flow name and (connection label, variable, sign, factor, unit).
+    '''
+    def __init__(self, specs=FLOW_SPECS):
+        self.specs = dict(specs)
+        self.names = list(self.specs)
+        self.units = [spec[4] for spec in self.specs.values()]
+        self.factors = np.array([spec[2] * spec[3] for spec in self.specs.values()], dtype=float)
+        self._network = None
+        self._containers = None
+
+    def bind(self, network):
+        '''Variable containers of all flows in network. Resolved once per network object.'''
+        if network is not self._network:
+            self._containers = [getattr(network.get_conn(label), variable)
+                                for label, variable, *_ in self.specs.values()]
+            self._network = network
+        return self._containers
+
+    def evaluate(self, network):
+        '''Amounts of all flows of a solved network (TESPy network or StoredNetwork) as float array.'''
+        return np.array([c.val_SI for c in self.bind(network)]) * self.factors
+
+    def evaluate_many(self, networks):
+        '''Amounts of all flows of several solved networks, shape (len(networks), len(names)).'''
+        return np.vstack([self.evaluate(network) for network in networks])
+
+    def amount(self, model, name, network=None):
+        '''Flow amount function of flow name of model, returns the amount as pint quantity.
+        network: function returning the network of the flow, default is model.model'''
+        i = self.names.index(name)
+        unit = self.units[i]
+        get_network = (lambda: model.model) if network is None else network
+
+        def amount():
+            network = get_network()
+            return network.units.ureg.Quantity(self.bind(network)[i].val_SI * self.factors[i], unit)
+        return amount
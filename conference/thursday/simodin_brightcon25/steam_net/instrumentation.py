@@ -0,0 +1,184 @@
+'''
+Solver instrumentation of the steam net.
+
+A SolveMetrics object attached to a steam_net model (steam_net.instrument())
+receives one record per TESPy solve and per failed calculation. Records are
+plain dicts, so they can be passed to a scheduler callback or collected to a
+DataFrame. Without attached metrics nothing is recorded.
+
+Solve record keys:
+    model: name of the model
+    stage: solve stage, e.g. 'first', 'second', 'third' of the network build, 'template' or 'recalculate'
+    wall_time_s: wall time of the solve
+    iterations: Newton iterations of the solve
+    residual: norm of the final residual
+    status: TESPy status code, 0 and 1 are converged
+    converged: converged flag of the network
+    topology: topology of the model at the end of the solve
+    coolprop_calls: CoolProp state evaluations since the previous record, of TESPy and of the
+        steam_net property layer (properties.props())
+    tespy_property_calls: part of coolprop_calls made by TESPy's fluid property wrapper
+
+TESPy's evaluations are counted by wrapping the property methods of its
+CoolPropWrapper class. The wrappers are installed when metrics are attached to
+the first model and the original methods are restored when the last model is
+detached (detach(), steam_net.uninstrument()). The counters are per process,
+solves of models without metrics running at the same time are counted too.
+'''
+import functools
+
+import numpy as np
+import pandas as pd
+from tespy.tools.fluid_properties.wrappers import CoolPropWrapper
+
+from . import properties as snpr
+
+# CoolProp state evaluations of TESPy in this process, counted while metrics are attached to a model:
+tespy_calls = 0
+# methods calling other wrapped methods or no CoolProp update:
+_NOT_COUNTED = ['isentropic', 'get_T_max']
+# attached models and original methods of CoolPropWrapper, restored when the last model is detached:
+_attached = 0
+_originals = {}
+
+
+def _counted(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        global tespy_calls
+        tespy_calls += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def count_tespy_calls():
+    '''Start counting the property evaluations of TESPy's CoolPropWrapper in tespy_calls.
+
+    The wrappers are installed on the class by the first call and removed again, when every call
+    was matched by stop_counting_tespy_calls().
+    '''
+    global _attached
+    if _attached == 0:
+        for name, method in list(vars(CoolPropWrapper).items()):
+            if callable(method) and not name.startswith('_') and name not in _NOT_COUNTED:
+                _originals[name] = method
+                setattr(CoolPropWrapper, name, _counted(method))
+    _attached += 1
+
+
+def stop_counting_tespy_calls():
+    '''Undo one count_tespy_calls(), the original methods are restored after the last one.'''
+    global _attached
+    if _attached == 0:
+        return
+    _attached -= 1
+    if _attached == 0:
+        for name, method in _originals.items():
+            setattr(CoolPropWrapper, name, method)
+        _originals.clear()
+
+
+def attach(model, metrics=None, callback=None):
+    '''Attach SolveMetrics to model (steam_net or steam_site), see steam_net.instrument().
+
+    TESPy's property evaluations are counted while at least one model has metrics attached.
+
+    Args:
+        model: model, whose solves are recorded.
+        metrics: SolveMetrics to share between models, default is a new one.
+        callback: function called with every record, used if no metrics are passed.
+
+    Returns:
+        the attached SolveMetrics.
+    '''
+    if model.instrumentation is None:
+        count_tespy_calls()
+    model.instrumentation = SolveMetrics(callback) if metrics is None else metrics
+    model.instrumentation._sync()
+    return model.instrumentation
+
+
+def detach(model):
+    '''Remove the metrics of model and stop counting TESPy's property evaluations for it.'''
+    if model.instrumentation is not None:
+        model.instrumentation = None
+        stop_counting_tespy_calls()
+
+
+class SolveMetrics:
+    '''Collector of solve and failure records.
+
+    Args:
+        callback: function called with every new record, e.g. to forward it to a scheduler.
+        keep: store the records in self.records. Set to False if only the callback is needed.
+    '''
+    def __init__(self, callback=None, keep=True):
+        self.callback = callback
+        self.keep = keep
+        self.records = []
+        self._sync()
+
+    def _sync(self):
+        # start the next CoolProp call delta at the current counters
+        self._coolprop_calls = snpr.coolprop_calls
+        self._tespy_calls = tespy_calls
+
+    def _emit(self, record):
+        if self.keep:
+            self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def _coolprop_delta(self):
+        props_calls = snpr.coolprop_calls - self._coolprop_calls
+        tespy = tespy_calls - self._tespy_calls
+        self._coolprop_calls = snpr.coolprop_calls
+        self._tespy_calls = tespy_calls
+        return {'coolprop_calls': props_calls + tespy, 'tespy_property_calls': tespy}
+
+    def solve(self, model, stage, wall_time):
+        '''Record a finished solve of model.model.'''
+        network = model.model
+        history = getattr(network, 'residual_history', [])
+        self._emit({
+            'model': model.name,
+            'stage': stage,
+            'wall_time_s': wall_time,
+            'iterations': getattr(network, 'iter', -1) + 1,
+            'residual': float(history[-1]) if len(history) else np.nan,
+            'status': getattr(network, 'status', None),
+            'converged': bool(network.converged),
+            'topology': model.topology,
+            } | self._coolprop_delta())
+
+    def failure(self, model, stage, exception):
+        '''Record a failed calculation.'''
+        self._emit({
+            'model': model.name,
+            'stage': stage,
+            'converged': False,
+            'topology': model.topology,
+            'error': f'{type(exception).__name__}: {exception}',
+            } | self._coolprop_delta())
+
+    def clear(self):
+        self.records.clear()
+
+    def to_frame(self):
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        '''Number of solves, wall time, iterations, CoolProp calls and failures per stage.'''
+        df = self.to_frame()
+        if df.empty:
+            return df
+        if 'error' not in df:
+            df['error'] = None
+        return df.groupby('stage').agg(
+            solves=('stage', 'size'),
+            wall_time_s=('wall_time_s', 'sum'),
+            iterations_mean=('iterations', 'mean'),
+            coolprop_calls=('coolprop_calls', 'sum'),
+            failures=('error', 'count'),
+            not_converged=('converged', lambda c: int((~c.astype(bool)).sum())),
+            )
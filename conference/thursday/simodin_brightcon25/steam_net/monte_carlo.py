@@ -0,0 +1,166 @@
+'''
+Monte Carlo uncertainty propagation through the steam net flows.
+
+The samples of all uncertain params are drawn at once and solved as one
+batch on the process pool of the sweep, where every worker reuses its
+solved networks (template cache). Alternatively, a fitted surrogate answers
+the whole batch without solving. The flow amounts are returned as NumPy
+arrays and can be written to a bw_processing datapackage, which brightway
+uses as sequential resampled exchange values.
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+from .bw_link import linked_dataset
+from .sweep import RESULT_COLUMNS
+
+
+def _draw(distribution, n, rng):
+    if hasattr(distribution, 'rvs'):
+        # scipy.stats frozen distribution
+        return distribution.rvs(size=n, random_state=rng)
+    if isinstance(distribution, dict):
+        kind = distribution['distribution']
+        if kind == 'normal':
+            return rng.normal(distribution['loc'], distribution['scale'], n)
+        elif kind == 'lognormal':
+            # loc and scale of the underlying normal distribution, like stats_arrays
+            return rng.lognormal(distribution['loc'], distribution['scale'], n)
+        elif kind == 'uniform':
+            return rng.uniform(distribution['minimum'], distribution['maximum'], n)
+        elif kind == 'triangular':
+            return rng.triangular(distribution['minimum'], distribution['loc'], distribution['maximum'], n)
+        raise ValueError(f'Unknown distribution {kind}.')
+    values = np.asarray(distribution, dtype=float)
+    if values.shape != (n,):
+        raise ValueError(f'Expected {n} sample values, got shape {values.shape}.')
+    return values
+
+
+def sample(distributions, n, seed=None):
+    '''Draw n samples of every uncertain parameter.
+
+    Args:
+        distributions: dict of parameter name and distribution. A distribution is a frozen
+            scipy.stats distribution, a dict with the key 'distribution' ('normal', 'lognormal',
+            'uniform' or 'triangular') and the keys loc, scale, minimum and maximum as needed,
+            or an array of n already drawn values.
+        n: number of samples.
+        seed: seed of the random generator.
+
+    Returns:
+        DataFrame with one sample per row.
+    '''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({name: _draw(dist, n, rng) for name, dist in distributions.items()})
+
+
+class MonteCarloResult:
+    '''Samples and results of a Monte Carlo run.
+
+    Attributes:
+        samples: DataFrame of the sampled params.
+        results: DataFrame of the result factors and flow amounts per sample.
+        converged: boolean array, False for failed samples (NaN results).
+    '''
+    def __init__(self, samples, results):
+        self.samples = samples
+        self.results = results
+        if 'converged' in results:
+            self.converged = results['converged'].to_numpy(dtype=bool)
+        else:
+            self.converged = np.ones(len(results), dtype=bool)
+
+    @property
+    def flows(self):
+        '''Flow names in the results.'''
+        return [col for col in self.results.columns
+                if col not in RESULT_COLUMNS + ['converged', 'error', 'topology', 'surrogate']
+                and col not in self.samples.columns]
+
+    def amounts(self, name):
+        '''Samples of a result factor or flow amount as array.'''
+        return self.results[name].to_numpy(dtype=float)
+
+    def summary(self, percentiles=(2.5, 50, 97.5)):
+        '''Mean, standard deviation and percentiles of all results of the converged samples.'''
+        data = self.results.loc[self.converged, RESULT_COLUMNS + self.flows].astype(float)
+        table = pd.DataFrame({'mean': data.mean(), 'std': data.std()})
+        for p in percentiles:
+            table[f'p{p}'] = np.percentile(data, p, axis=0)
+        return table
+
+    def to_datapackage(self, interface, node, factors, name='steam_net_monte_carlo'):
+        '''Write the sampled exchange amounts of the linked flows as bw_processing datapackage.
+
+        The amounts are scaled to one unit of the reference flow and converted to the dataset
+        units like in modelInterface.export_to_bw(). Failed samples are dropped.
+
+        Args:
+            interface: simodin modelInterface with linked datasets.
+            node: brightway activity of the exported model, e.g. from export_to_bw().
+            factors: unit factors of the reference and the linked flows, see bw_link.unit_factors(),
+                taken from a converged model state with non-zero amounts.
+            name: name of the datapackage and its resources.
+
+        Returns:
+            bw_processing datapackage with sequential technosphere and biosphere arrays.
+        '''
+        import bw_processing as bwp
+
+        model = interface.model
+        interface._get_reference()
+        reference = model._technosphere[interface._reference_flow]
+        ref_amounts = self.amounts(reference.name)[self.converged] * factors[reference.name]
+
+        dp = bwp.create_datapackage(name=name, sequential=True)
+        technosphere = [(ex, linked_dataset(model, ex))
+                        for ex in model._technosphere.values() if not ex.functional]
+        biosphere = [(ex, linked_dataset(model, ex)) for ex in model._biosphere.values()]
+        for matrix, edges, flip in [('technosphere_matrix', technosphere, True),
+                                    ('biosphere_matrix', biosphere, False)]:
+            edges = [(ex, dataset) for ex, dataset in edges if dataset is not None]
+            if not edges:
+                continue
+            data = np.array([
+                self.amounts(ex.name)[self.converged] * factors[ex.name]
+                * reference.allocationfactor * (ex.dataset_correction or 1) / ref_amounts
+                for ex, _ in edges])
+            indices = np.array([(dataset.id, node.id) for _, dataset in edges], dtype=bwp.INDICES_DTYPE)
+            dp.add_persistent_array(
+                matrix=matrix,
+                data_array=data,
+                name=f'{name}_{matrix}',
+                indices_array=indices,
+                flip_array=np.full(len(edges), flip, dtype=bool),
+                )
+        return dp
+
+
+def run_monte_carlo(model, distributions, n, seed=None, max_workers=None, chunksize=None, surrogate=False):
+    '''Propagate the uncertainty of params through the steam net.
+
+    Args:
+        model: steam_net instance. Its params are the base of every sample.
+        distributions: dict of parameter name and distribution, see sample().
+        n: number of samples.
+        seed: seed of the random generator.
+        max_workers: number of worker processes, default is the number of cpus.
+        chunksize: samples per worker task, default is an even split over the workers.
+        surrogate: evaluate the samples with model.surrogate instead of real solves.
+
+    Returns:
+        MonteCarloResult
+    '''
+    samples = sample(distributions, n, seed)
+    if surrogate:
+        results = model.predict(samples, max_workers)
+    else:
+        if chunksize is None:
+            workers = max_workers or os.cpu_count() or 1
+            chunksize = max(1, n // (4 * workers))
+        results = model.sweep(samples, max_workers, chunksize)
+        results = results.drop(columns=samples.columns)
+    return MonteCarloResult(samples, results.reset_index(drop=True))
@@ -0,0 +1,95 @@
+'''
+Memoized and vectorized IF97 water properties for the steam net.
+
+All CoolProp lookups of the steam net preprocessing go through props(). Scalar
+calls are answered from a bounded LRU cache. Array calls are reduced to their
+unique, not yet cached input pairs, which are passed to CoolProp in one call.
+'''
+from collections import OrderedDict
+
+import numpy as np
+from CoolProp.CoolProp import PropsSI
+
+BACKEND = 'IF97::water'
+
+_cache = OrderedDict()
+cache_maxsize = 100_000
+# number of PropsSI calls and of evaluated states, e.g. for instrumentation:
+coolprop_calls = 0
+coolprop_states = 0
+
+
+def _store(key, value):
+    _cache[key] = value
+    if len(_cache) > cache_maxsize:
+        _cache.popitem(last=False)
+
+
+def props(output, name1, value1, name2, value2):
+    '''PropsSI of IF97 water for scalars or arrays in SI units.
+
+    Args:
+        output: output property, e.g. 'H'.
+        name1, value1: first input property and value(s).
+        name2, value2: second input property and value(s).
+
+    Returns:
+        float for scalar inputs, else array with the broadcasted shape of the inputs.
+    '''
+    global coolprop_calls, coolprop_states
+    if np.ndim(value1) == 0 and np.ndim(value2) == 0:
+        key = (output, name1, float(value1), name2, float(value2))
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+        coolprop_calls += 1
+        coolprop_states += 1
+        value = PropsSI(output, name1, float(value1), name2, float(value2), BACKEND)
+        _store(key, value)
+        return value
+
+    value1, value2 = np.broadcast_arrays(np.asarray(value1, dtype=float), np.asarray(value2, dtype=float))
+    pairs, inverse = np.unique(np.column_stack([value1.ravel(), value2.ravel()]),
+                               axis=0, return_inverse=True)
+    keys = [(output, name1, v1, name2, v2) for v1, v2 in pairs.tolist()]
+    found = {}
+    missing = []
+    for i, key in enumerate(keys):
+        if key in _cache:
+            _cache.move_to_end(key)
+            found[key] = _cache[key]
+        else:
+            missing.append(i)
+    if missing:
+        coolprop_calls += 1
+        coolprop_states += len(missing)
+        values = np.atleast_1d(PropsSI(output, name1, pairs[missing, 0], name2, pairs[missing, 1], BACKEND))
+        for i, value in zip(missing, values.tolist()):
+            found[keys[i]] = value
+            _store(keys[i], value)
+    # the result is read from found, _store() may already have evicted keys of this call
+    result = np.array([found[key] for key in keys])
+    return result[inverse.ravel()].reshape(value1.shape)
+
+
+def needed_pressure(needed_temperature):
+    '''Saturation pressure in bar of the needed temperature in °C.'''
+    return props('P', 'Q', 0, 'T', np.add(needed_temperature, 273)) * 1E-5
+
+
+def saturation_temperature(pressure):
+    '''Saturation temperature in °C of the pressure in bar.'''
+    return props('T', 'P', np.multiply(pressure, 1E5), 'Q', 1) - 273.15
+
+
+def superheating_enthalpy(main_pressure, max_pressure):
+    '''
+    Enthalpy in kJ/kg at max_pressure (bar), which reaches saturated steam at main_pressure (bar)
+    by isentropic expansion.
+    '''
+    s = props('S', 'P', np.multiply(main_pressure, 1E5), 'Q', 1)
+    return props('H', 'P', np.multiply(max_pressure, 1E5), 'S', s) * 1E-3
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,160 @@
+'''
+Persisted map of the steam net topology over the main parameter axes.
+
+Depending on the state of the steam at c022 the network needs condensate
+injection (superheated), a condensate trap (wet) or neither. Without a map
+this is only known after two solves of the plain network. The regime map is
+built once from a coarse grid of real solves. Every grid edge whose end
+points have different topologies is bisected until the boundary is
+resolved to the requested depth. A new point gets the topology of its
+nearest solved point in coordinates normalized to the map bounds.
+
+Like the surrogate, the map is versioned by MODEL_VERSION and the hash of
+all parameters, which are not axes of the map.
+'''
+import json
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from .steam_network_model import MODEL_VERSION, base_magnitude, params_hash
+from .sweep import parameter_grid
+
+REGIME_AXES = ['needed_temperature', 'pipe_length', 'insulation_thickness', 'Tamb', 'heat']
+FAILED = 'failed'
+
+
+class RegimeMap:
+    '''Nearest neighbour map of solved points and their topology.
+
+    Args:
+        axes: names of the parameter axes.
+        lower, upper: bounds of the axes.
+        X: solved points, shape (n, len(axes)).
+        labels: topology of every point, 'failed' for points which did not converge.
+        version: version key of the model parameters, see version_key().
+    '''
+    def __init__(self, axes, lower, upper, X, labels, version):
+        self.axes = list(axes)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.X = np.asarray(X, dtype=float)
+        self.labels = np.asarray(labels, dtype=str)
+        self.version = version
+        self._scale = self.upper - self.lower
+        self._scale[self._scale == 0] = 1
+        self._tree = cKDTree(self._scaled(self.X))
+
+    def __len__(self):
+        return len(self.X)
+
+    @staticmethod
+    def version_key(params, axes):
+        '''Hash of the model version and of all parameters, which are not axes of the map.'''
+        return params_hash({key: value for key, value in params.items() if key not in axes})
+
+    def _scaled(self, X):
+        return (X - self.lower) / self._scale
+
+    @staticmethod
+    def _solve(model, X, axes, max_workers):
+        results = model.sweep(pd.DataFrame(X, columns=axes), max_workers)
+        return np.where(results['converged'], results['topology'].fillna(FAILED), FAILED).astype(str)
+
+    @classmethod
+    def build(cls, model, bounds, levels=3, depth=4, max_workers=None):
+        '''Build the map from real solves.
+
+        Args:
+            model: steam_net instance, whose params are used as base parameters.
+            bounds: dict of axis name and (lower, upper) bound, e.g. {'needed_temperature': (120, 250)}.
+            levels: points per axis of the coarse grid.
+            depth: bisection steps of every edge crossing a topology boundary. The boundary is
+                resolved to 1/(levels-1)/2**depth of the axis range.
+            max_workers: number of worker processes of the sweeps.
+
+        Returns:
+            RegimeMap
+        '''
+        axes = list(bounds)
+        lower = np.array([base_magnitude(bounds[a][0]) for a in axes], dtype=float)
+        upper = np.array([base_magnitude(bounds[a][1]) for a in axes], dtype=float)
+        grid = parameter_grid(**{a: np.linspace(lo, up, levels) for a, lo, up in zip(axes, lower, upper)})
+        X = grid.to_numpy(dtype=float)
+        labels = cls._solve(model, X, axes, max_workers)
+
+        # edges between neighbouring grid points, parameter_grid is in C order
+        index = np.arange(len(X)).reshape([levels] * len(axes))
+        edges = []
+        for d in range(len(axes)):
+            first = np.take(index, range(levels - 1), axis=d).ravel()
+            second = np.take(index, range(1, levels), axis=d).ravel()
+            edges += list(zip(first, second))
+
+        for _ in range(depth):
+            split = [(a, b) for a, b in edges if labels[a] != labels[b]]
+            if not split:
+                break
+            mid = np.array([(X[a] + X[b]) / 2 for a, b in split])
+            start = len(X)
+            X = np.vstack([X, mid])
+            labels = np.concatenate([labels, cls._solve(model, mid, axes, max_workers)])
+            edges = []
+            for i, (a, b) in enumerate(split):
+                edges += [(a, start + i), (start + i, b)]
+
+        return cls(axes, lower, upper, X, labels, cls.version_key(model.params, axes))
+
+    def in_bounds(self, X):
+        return np.all((X >= self.lower) & (X <= self.upper), axis=1)
+
+    def predict(self, points):
+        '''Topology of the points, None outside of the bounds or next to failed points.
+
+        Args:
+            points: DataFrame or dict of parameter lists with all axes of the map.
+
+        Returns:
+            array of the topologies.
+        '''
+        points = pd.DataFrame(points)
+        X = points[self.axes].map(base_magnitude).to_numpy(dtype=float)
+        _, nearest = self._tree.query(self._scaled(X))
+        labels = self.labels[nearest].astype(object)
+        labels[(labels == FAILED) | ~self.in_bounds(X)] = None
+        return labels
+
+    def predict_one(self, params):
+        '''Topology of a single parameter set or None.'''
+        return self.predict({key: [params[key]] for key in self.axes})[0]
+
+    def save(self, path):
+        '''Save the solved points and metadata as npz file.'''
+        meta = {
+            'model_version': MODEL_VERSION,
+            'version': self.version,
+            'axes': self.axes,
+            }
+        np.savez(path, lower=self.lower, upper=self.upper, X=self.X, labels=self.labels, meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path, params=None):
+        '''Load a saved map.
+
+        Args:
+            path: path of the npz file.
+            params: model params to check the version against.
+
+        Raises:
+            ValueError: if the map was built for another model version or other parameters.
+        '''
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            lower, upper, X, labels = data['lower'], data['upper'], data['X'], data['labels']
+        if meta['model_version'] != MODEL_VERSION:
+            raise ValueError(f"Regime map was built with model version {meta['model_version']}, "
+                             f'current version is {MODEL_VERSION}.')
+        if params is not None and cls.version_key(params, meta['axes']) != meta['version']:
+            raise ValueError('Regime map was built for other model parameters.')
+        return cls(meta['axes'], lower, upper, X, labels, meta['version'])
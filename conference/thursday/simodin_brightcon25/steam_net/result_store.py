@@ -0,0 +1,172 @@
+'''
+Content-addressed, persistent store of solved steam net states.
+
+Results are keyed by the hash of all params (incl. mains and max_pressure)
+and MODEL_VERSION. Every entry is one npz file with the scalar results, the
+connection table (one array per property) and the flow amounts. Files are
+written to a temporary file and moved in place, so several processes can
+use the same store directory at once.
+
+On a hit, calculate_model() replaces the TESPy network with a read-only
+StoredNetwork. It provides get_conn() like a solved network, so _result()
+and the flow amount functions work without solving.
+'''
+import json
+import logging
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from tespy.connections import Connection
+from tespy.tools.units import Units
+
+from .steam_network_model import MODEL_VERSION, params_hash
+from .sweep import RESULT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_PROPERTIES = ['m', 'p', 'h', 'T', 's', 'x', 'v']
+SCALARS = RESULT_COLUMNS + ['needed_pressure', 'main_pressure', 'h_superheating_max_pressure']
+
+
+class StoredResult:
+    '''Stored state of one solved parameter set.
+
+    Attributes:
+        key: hash of the parameters.
+        topology: topology of the solved network.
+        scalars: dict of the result factors and preprocessing values.
+        exergy: dict of E_bpt and E_hs as (magnitude, unit).
+        connections: DataFrame of the connection properties, index are the connection labels.
+        units: dict of the unit of every connection property column.
+        flows: dict of flow name and (amount, unit).
+    '''
+    def __init__(self, key, topology, scalars, exergy, connections, units, flows):
+        self.key = key
+        self.topology = topology
+        self.scalars = scalars
+        self.exergy = exergy
+        self.connections = connections
+        self.units = units
+        self.flows = flows
+
+
+class _StoredValue:
+    # read-only stand-in of a TESPy data container
+    def __init__(self, value, unit, ureg):
+        self.val = value
+        self._val = ureg.Quantity(value, unit)
+        self.val_SI = self._val.to_base_units().magnitude
+
+
+class _StoredConnection:
+    def __init__(self, label, values, units, ureg):
+        self.label = label
+        for prop, value in values.items():
+            if not np.isnan(value):
+                setattr(self, prop, _StoredValue(value, units[prop], ureg))
+
+
+class StoredNetwork:
+    '''Read-only network of a StoredResult, answering get_conn() without solving.
+
+    The values are quantities of the unit registry of TESPy's Units, which knows the TESPy unit names (e.g. m3).
+    '''
+    converged = True
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.units = Units()
+        ureg = self.units.ureg
+        self._conns = {
+            label: _StoredConnection(label, row.to_dict(), stored.units, ureg)
+            for label, row in stored.connections.iterrows()}
+
+    def get_conn(self, label):
+        '''Stored connection of label or None, like Network.get_conn() for a missing label.'''
+        return self._conns.get(label)
+
+
+class ResultStore:
+    '''Directory of stored steam net results.
+
+    Args:
+        path: store directory, created if missing.
+    '''
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(params):
+        return params_hash(params)
+
+    def _file(self, key):
+        return self.path / key[:2] / f'{key}.npz'
+
+    def __contains__(self, params):
+        return self._file(self.key(params)).exists()
+
+    def get(self, params):
+        '''Stored result of params or None, also for unreadable files.'''
+        key = self.key(params)
+        try:
+            with np.load(self._file(key)) as data:
+                meta = json.loads(str(data['meta']))
+                columns = {prop: data[f'conn_{prop}'] for prop in meta['columns']}
+                labels = data['conn_labels']
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+            # truncated or corrupt file, recomputed and overwritten by the next put()
+            logger.warning(f'Ignore unreadable stored result {self._file(key)}: {e}')
+            return None
+        connections = pd.DataFrame(columns, index=labels.tolist())
+        flows = {name: tuple(value) for name, value in meta['flows'].items()}
+        exergy = {name: tuple(value) for name, value in meta['exergy'].items()}
+        return StoredResult(key, meta['topology'], meta['scalars'], exergy, connections, meta['units'], flows)
+
+    def put(self, model):
+        '''Store the converged state of model. Returns the key.'''
+        key = self.key(model.params)
+        columns = {prop: [] for prop in CONNECTION_PROPERTIES + ['E']}
+        units = {}
+        labels = []
+        for c in model.model.conns['object']:
+            labels.append(c.label)
+            props = CONNECTION_PROPERTIES if isinstance(c, Connection) else ['E']
+            for prop in columns:
+                if prop not in props:
+                    columns[prop].append(np.nan)
+                    continue
+                container = c.get_attr(prop)
+                columns[prop].append(container.val)
+                units.setdefault(prop, container.unit)
+        amounts = model.flow_amounts()
+        flows = {name: (float(amounts[name]), unit) for name, unit in zip(model.flow_plan.names, model.flow_plan.units)}
+        meta = {
+            'model_version': MODEL_VERSION,
+            'topology': model.topology,
+            'scalars': {name: float(getattr(model, name)) for name in SCALARS},
+            'exergy': {name: (float(getattr(model, name).m), str(getattr(model, name).u))
+                       for name in ['E_bpt', 'E_hs']},
+            'columns': list(columns),
+            'units': units,
+            'flows': flows,
+            }
+        arrays = {f'conn_{prop}': np.array(values, dtype=float) for prop, values in columns.items()}
+
+        target = self._file(key)
+        target.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, conn_labels=np.array(labels), meta=json.dumps(meta), **arrays)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return key
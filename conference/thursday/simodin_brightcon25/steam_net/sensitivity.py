@@ -0,0 +1,148 @@
+'''
+Local sensitivities of the steam net results from the converged Jacobian.
+
+TESPy inverts the Jacobian of every Newton step, but keeps only the dense
+matrix of the last step. Here it is LU-factorised once. For every parameter,
+the residuals of the network equations are evaluated at the converged state
+with the perturbed parameter, dF = F(x*, p + dp), and the state change
+dx = -J^-1 dF is one back substitution with the factorised Jacobian.
+
+One step is not enough: TESPy presolves Ref specifications into groups of
+linear dependent variables, and the factor of e.g. leakage_factor moves the
+whole group when the network is re-initialised. The seeded state is then
+no longer x* and a single step misses the boiler and pump flows by a factor
+of three. The step is therefore repeated as chord (simplified Newton)
+iteration with the same factorised Jacobian, until the residuals are below
+RESIDUAL_TOLERANCE, usually after two or three back substitutions. The
+outputs are derived from the converged perturbed state.
+
+The network is re-initialised for every parameter (solve with
+init_only=True), because parameters like needed_temperature or Tamb are
+propagated to fixed connection values during the problem preparation.
+No Jacobian is evaluated for the perturbed points. After all parameters,
+the network is solved once more at the original parameters to restore the
+model.
+
+The linearization uses private internals of the TESPy network (variables,
+residual and Jacobian of the solver), checked for the TESPy versions in
+TESPY_VERSIONS (the version of environment.yaml).
+'''
+import numpy as np
+import pandas as pd
+import tespy
+from scipy.linalg import lu_factor, lu_solve
+from tespy.networks import Network
+
+from .steam_network_model import solve
+from .sweep import RESULT_COLUMNS
+from .warm_start import SolutionIndex
+
+SENSITIVITY_PARAMS = [
+    'needed_temperature',
+    'makeup_factor',
+    'leakage_factor',
+    'Tamb',
+    'heat',
+    'wind_velocity',
+    'insulation_thickness',
+    'pipe_length',
+    'max_pressure',
+    ]
+
+TESPY_VERSIONS = ('0.9.',)
+# norm of the network residuals, which ends the chord iteration of a perturbed point:
+RESIDUAL_TOLERANCE = 1E-6
+MAX_CHORD_STEPS = 10
+
+
+def _outputs(model):
+    return {col: getattr(model, col) for col in RESULT_COLUMNS} | model.flow_amounts()
+
+
+def _apply_increment(network):
+    # full linear step: Network._update_variables() relaxes the step depending on network.iter,
+    # robust_relax and the size of the pressure increments
+    for data in network.variables_dict.values():
+        container = data['obj']
+        if data['variable'] == 'fluid':
+            container.val[data['fluid']] += network.increment[container.J_col[data['fluid']]]
+        else:
+            container._val_SI += network.increment[container.J_col]
+
+
+def _linearized_outputs(model, lu, state):
+    network = model.model
+    model.change_parameters()
+    SolutionIndex.seed(network, state)
+    network.solve('design', init_only=True)
+    n = network.variable_counter
+    if lu[0].shape[0] != n:
+        raise ValueError('The perturbed network has a different set of variables than the converged network.')
+
+    for _ in range(MAX_CHORD_STEPS):
+        network.residual = np.zeros(n)
+        network.jacobian = np.zeros((n, n))
+        network.increment_filter = np.zeros(n, dtype=bool)
+        network.solve_equations()
+        network.solve_busses()
+        if np.linalg.norm(network.residual) < RESIDUAL_TOLERANCE:
+            break
+        network.increment = lu_solve(lu, -network.residual)
+        _apply_increment(network)
+    else:
+        raise ValueError(f'The perturbed network did not converge in {MAX_CHORD_STEPS} steps with the '
+                         'converged Jacobian, use a smaller rel_step.')
+    network.unload_variables()
+    network.postprocessing()
+    model._result()
+    return _outputs(model)
+
+
+def local_sensitivities(model, params=None, rel_step=1E-4):
+    '''Derivatives of the result factors and flow amounts with respect to the parameters.
+
+    Args:
+        model: steam_net with a converged TESPy network (calculate_model() or recalculate_model()).
+        params: parameter names, default is SENSITIVITY_PARAMS.
+        rel_step: relative parameter perturbation of the linearization.
+
+    Returns:
+        DataFrame with one row per output and one column per parameter, d output / d parameter
+        in the units of the parameters and of the flow amount functions.
+    '''
+    if not tespy.__version__.startswith(TESPY_VERSIONS):
+        raise RuntimeError(f'Sensitivities use internals of TESPy {TESPY_VERSIONS}, installed is {tespy.__version__}.')
+    network = model.model
+    if not isinstance(network, Network) or not model.converged or not network.converged:
+        raise ValueError('Sensitivities need a converged TESPy network, calculate the model without result store.')
+    params = SENSITIVITY_PARAMS if params is None else params
+
+    lu = lu_factor(network.jacobian)
+    state = SolutionIndex.state(network)
+    base_params = model.params.copy()
+    base_outputs = _outputs(model)
+    main_pressure = model.main_pressure
+
+    derivatives = {}
+    try:
+        for name in params:
+            value = base_params[name]
+            step = rel_step * abs(value) or rel_step
+            model.params = base_params | {name: value + step}
+            model._calc_mains()
+            if model.main_pressure != main_pressure:
+                # the forward step jumps to the next steam main, use the backward step
+                step = -step
+                model.params = base_params | {name: value + step}
+                model._calc_mains()
+            outputs = _linearized_outputs(model, lu, state)
+            derivatives[name] = {key: (outputs[key] - base) / step for key, base in base_outputs.items()}
+    finally:
+        model.params = base_params
+        model._calc_mains()
+        model.change_parameters()
+        SolutionIndex.seed(network, state)
+        solve(model, 'sensitivity')
+        model._result()
+
+    return pd.DataFrame(derivatives)
@@ -0,0 +1,287 @@
+'''
+Steam distribution network of a site with many consumers.
+
+The consumers are partitioned by the steam main serving them. Every main is
+one TESPy network of its own, so the size of the Newton system grows with the
+consumers of one main and not with the whole site. Each main is a branched
+tree: consumers with the same segment share a steam line from the main header
+to a branch point and a condensate line back to the return header:
+
+    boiler -> back pressure turbine -> steam leak -> main header
+        -> per consumer without segment: steam pipe -> control valve
+           -> heat exchanger -> condensate pipe -> condensate valve
+        -> per segment: steam segment -> segment splitter
+           -> per consumer of the segment: steam pipe -> control valve
+              -> heat exchanger -> condensate pipe -> condensate valve
+           -> segment return -> condensate segment
+        -> condensate return -> blowdown -> make-up water -> feed pump
+
+The starting values of all connections are computed from the main pressure and
+the needed pressures of the consumers with the property layer. Every main
+therefore converges in one solve, without the staged solves of the single
+consumer steam net. Consumers are modelled without condensate injection or
+condensate traps.
+
+The boiler house is modelled per main: every main has its own boiler and back
+pressure turbine. All boilers start from the same state (max_pressure and
+h_superheating_max_pressure), so this is the same as one boiler feeding all
+turbines, and the boiler flows of the site are the sums over the mains.
+'''
+import numpy as np
+from tespy.components import (
+    Turbine, Source, Sink, Pump,
+    Pipe, CycleCloser, SimpleHeatExchanger, Valve, Merge,
+    Splitter,
+    PowerSink, PowerSource, Generator, PowerBus
+)
+from tespy.connections import Connection, Ref, PowerConnection
+
+from . import properties as snpr
+from .steam_network_model import solve
+
+CONSUMER_COLUMNS = ['name', 'heat', 'needed_temperature', 'pipe_length', 'insulation_thickness']
+# columns of the segment of a consumer, the same for all consumers of one segment:
+SEGMENT_COLUMNS = ['segment_length', 'segment_insulation_thickness']
+# pressure ratio of the condensate return header to the lowest consumer pressure:
+RETURN_PRESSURE_RATIO = 0.8
+# pressure ratio of the steam line from the main header to a consumer, split between segment and branch:
+STEAM_LINE_PR = 0.98
+CONDENSATE_PR = 0.95
+
+
+def _pipe_attrs(site, length, insulation_thickness):
+    return dict(
+        Tamb=site.params['Tamb'],
+        L=length,
+        D='var',
+        ks=4.57e-5,
+        power_connector_location='outlet',
+        insulation_thickness=insulation_thickness,
+        insulation_tc=0.035, pipe_thickness=0.004, material='Steel',
+        wind_velocity=site.params['wind_velocity'], environment_media=site.params['environment_media'],
+        )
+
+
+def _consumer_branch(site, consumer, start, end, pr, h_main, h_liquid, pipe_heat):
+    '''
+    Steam pipe, control valve, heat exchanger, condensate pipe and condensate valve of one consumer
+    between the outlet start and the inlet end (component, port).
+    pipe_heat: function returning the next inlet (component, port) of the pipe dissipative losses bus
+    Returns the power connections of the branch.
+    '''
+    nw = site.model
+    name = consumer.name
+    needed = consumer.needed_pressure
+    main = consumer.main
+    pipe_warm = Pipe(f'steam pipe {name}', dissipative=True)
+    valve = Valve(f'controlvalve {name}')
+    hex_heat_sink = SimpleHeatExchanger(f'hex heat sink {name}', dissipative=False)
+    pipe_cold = Pipe(f'condensate pipe {name}', dissipative=True)
+    valve_cold = Valve(f'condensate valve {name}')
+
+    s1 = Connection(*start, pipe_warm, 'in1', label=f's1 {name}')
+    s2 = Connection(pipe_warm, 'out1', valve, 'in1', label=f's2 {name}')
+    s3 = Connection(valve, 'out1', hex_heat_sink, 'in1', label=f's3 {name}')
+    r1 = Connection(hex_heat_sink, 'out1', pipe_cold, 'in1', label=f'r1 {name}')
+    r2 = Connection(pipe_cold, 'out1', valve_cold, 'in1', label=f'r2 {name}')
+    r3 = Connection(valve_cold, 'out1', *end, label=f'r3 {name}')
+    nw.add_conns(s1, s2, s3, r1, r2, r3)
+
+    pipe_warm.set_attr(pr=pr, **_pipe_attrs(site, consumer.pipe_length, consumer.insulation_thickness))
+    pipe_cold.set_attr(pr=CONDENSATE_PR,
+                       **_pipe_attrs(site, consumer.condensate_length, consumer.insulation_thickness))
+    hex_heat_sink.set_attr(pr=1, Q=-consumer.heat, power_connector_location='outlet')
+    s1.set_attr(h0=h_main)
+    s2.set_attr(p0=main * STEAM_LINE_PR, h0=h_main)
+    s3.set_attr(p=needed, h0=h_main)
+    r1.set_attr(x=0, p0=needed)
+    r2.set_attr(p0=needed * CONDENSATE_PR, h0=h_liquid)
+    r3.set_attr(h0=h_liquid)
+
+    heat_sink = PowerSink(f'heat sink {name}')
+    return [
+        PowerConnection(hex_heat_sink, 'heat', heat_sink, 'power', label=f'e_heat_sink {name}'),
+        PowerConnection(pipe_warm, 'heat', *pipe_heat()),
+        PowerConnection(pipe_cold, 'heat', *pipe_heat()),
+        ]
+
+
+def create_main_network(site, main, consumers):
+    '''
+    Build and solve the network of one steam main in site.model.
+    main: main pressure in bar
+    consumers: DataFrame of the consumers of this main with the columns CONSUMER_COLUMNS,
+        condensate_length, segment, SEGMENT_COLUMNS, needed_pressure in bar and main (see assign_mains())
+    '''
+    nw = site.model
+    nw.set_attr(iterinfo=False)
+    nw.units.set_defaults(temperature='degC', pressure='bar', enthalpy='kJ / kg')
+    direct = consumers[consumers['segment'].isna()]
+    segments = consumers[consumers['segment'].notna()].groupby('segment', sort=False)
+    # one line from the main header per consumer without segment and per segment:
+    n = len(direct) + segments.ngroups
+    needed = consumers['needed_pressure'].to_numpy(dtype=float)
+    p_return = needed.min() * CONDENSATE_PR * RETURN_PRESSURE_RATIO
+
+    # starting values, one vectorized property call per state:
+    h_main = snpr.props('H', 'P', main * 1E5, 'Q', 1) * 1E-3
+    h_liquid = snpr.props('H', 'P', needed * 1E5, 'Q', 0) * 1E-3
+    h_return = float(snpr.props('H', 'P', p_return * 1E5, 'Q', 0)) * 1E-3
+
+    # central components:
+    boiler = SimpleHeatExchanger('steam boiler', dissipative=False)
+    bpt = Turbine('back pressure turbine')
+    steam_leak = Splitter('steam leak')
+    header = Splitter('main header', num_out=n)
+    condensate_return = Merge('condensate return', num_in=n)
+    split = Splitter('remove wastewater')
+    merge = Merge('Makeup water feed', num_in=3)
+    feed_pump = Pump('feedpump')
+    cycl = CycleCloser('CycleCloser')
+    steam_losses = Sink('steam losses')
+    makeup = Source('Make-up water')
+    makeup_leak = Source('leak makeup')
+    blowdown = Sink('blowdown wastewater')
+
+    c05 = Connection(cycl, 'out1', boiler, 'in1', label='c05')
+    c04 = Connection(boiler, 'out1', bpt, 'in1', label='c04')
+    c03 = Connection(bpt, 'out1', steam_leak, 'in1', label='c03')
+    c02 = Connection(steam_leak, 'out1', header, 'in1', label='c02')
+    c_leak = Connection(steam_leak, 'out2', steam_losses, 'in1', label='c_leak')
+    c2 = Connection(condensate_return, 'out1', split, 'in1', label='c2')
+    c3 = Connection(split, 'out1', merge, 'in1', label='c3')
+    wawa = Connection(split, 'out2', blowdown, 'in1', label='c_blowdown')
+    muw = Connection(makeup, 'out1', merge, 'in2', label='muw')
+    muw2 = Connection(makeup_leak, 'out1', merge, 'in3', label='muw2')
+    c4 = Connection(merge, 'out1', feed_pump, 'in1', label='c4')
+    c5 = Connection(feed_pump, 'out1', cycl, 'in1', label='c5')
+    nw.add_conns(c05, c04, c03, c02, c_leak, c2, c3, wawa, muw, muw2, c4, c5)
+
+    boiler.set_attr(pr=1, power_connector_location='inlet')
+    bpt.set_attr(eta_s=0.85)
+    feed_pump.set_attr(eta_s=0.95)
+    c05.set_attr(p0=site.params['max_pressure'])
+    c04.set_attr(fluid={'H2O': 1}, h=site.h_superheating_max_pressure)
+    c03.set_attr(p=main, h0=h_main)
+    c02.set_attr(h0=h_main)
+    c_leak.set_attr(m=Ref(c03, site.params['leakage_factor'], 0))
+    c2.set_attr(p=p_return, h0=h_return)
+    c4.set_attr(p0=p_return, h0=h_return)
+    c5.set_attr(p=site.params['max_pressure'], h0=h_return)
+    muw.set_attr(m=Ref(c04, site.params['makeup_factor'], 0), T=site.params['Tamb'],
+                 fluid={'H2O': 1}, p0=p_return)
+    muw2.set_attr(m=Ref(c_leak, 1, 0), T=site.params['Tamb'], fluid={'H2O': 1}, p0=p_return)
+    wawa.set_attr(m=Ref(c04, site.params['makeup_factor'], 0))
+
+    # consumer lines:
+    pipes = 2 * len(consumers) + 2 * segments.ngroups
+    pipe_diss_bus = PowerBus('pipe dissipative losses bus', num_in=pipes, num_out=1)
+    bus_ports = iter(range(1, pipes + 1))
+    pipe_heat = lambda: (pipe_diss_bus, f'power_in{next(bus_ports)}')
+    h_liquid = dict(zip(consumers['name'], h_liquid))
+    power = []
+    for i, consumer in enumerate(direct.itertuples(index=False)):
+        power += _consumer_branch(site, consumer, (header, f'out{i + 1}'), (condensate_return, f'in{i + 1}'),
+                                  STEAM_LINE_PR, h_main, h_liquid[consumer.name], pipe_heat)
+    for i, (segment, group) in enumerate(segments, start=len(direct) + 1):
+        first = group.iloc[0]
+        pipe_warm = Pipe(f'steam segment {segment}', dissipative=True)
+        split_segment = Splitter(f'segment {segment}', num_out=len(group))
+        merge_segment = Merge(f'segment return {segment}', num_in=len(group))
+        pipe_cold = Pipe(f'condensate segment {segment}', dissipative=True)
+
+        g1 = Connection(header, f'out{i}', pipe_warm, 'in1', label=f'g1 {segment}')
+        g2 = Connection(pipe_warm, 'out1', split_segment, 'in1', label=f'g2 {segment}')
+        g3 = Connection(merge_segment, 'out1', pipe_cold, 'in1', label=f'g3 {segment}')
+        g4 = Connection(pipe_cold, 'out1', condensate_return, f'in{i}', label=f'g4 {segment}')
+        nw.add_conns(g1, g2, g3, g4)
+
+        # the pressure drop of the steam line is split between segment and branch:
+        pipe_warm.set_attr(pr=STEAM_LINE_PR ** 0.5,
+                           **_pipe_attrs(site, first['segment_length'], first['segment_insulation_thickness']))
+        pipe_cold.set_attr(pr=CONDENSATE_PR,
+                           **_pipe_attrs(site, first['segment_length'], first['segment_insulation_thickness']))
+        g1.set_attr(h0=h_main)
+        g2.set_attr(p0=main * STEAM_LINE_PR ** 0.5, h0=h_main)
+        g3.set_attr(p0=p_return / CONDENSATE_PR, h0=h_return)
+        g4.set_attr(h0=h_return)
+        power += [
+            PowerConnection(pipe_warm, 'heat', *pipe_heat()),
+            PowerConnection(pipe_cold, 'heat', *pipe_heat()),
+            ]
+        for k, consumer in enumerate(group.itertuples(index=False)):
+            power += _consumer_branch(site, consumer, (split_segment, f'out{k + 1}'),
+                                      (merge_segment, f'in{k + 1}'), STEAM_LINE_PR ** 0.5, h_main,
+                                      h_liquid[consumer.name], pipe_heat)
+
+    fuel_bus = PowerSource('boiler powersource')
+    turbine_gen = Generator('turbines')
+    turbine_gen.set_attr(eta=0.9)
+    turbine_grid = PowerSink('grid')
+    pipe_diss_sink = PowerSink('pipe dissipative losses sink')
+    pump_psource = PowerSource('feedpump powersource')
+    power += [
+        PowerConnection(fuel_bus, 'power', boiler, 'heat', label='e_boil'),
+        PowerConnection(bpt, 'power', turbine_gen, 'power_in', label='e_turb'),
+        PowerConnection(turbine_gen, 'power_out', turbine_grid, 'power', label='e_turb_grid'),
+        PowerConnection(pipe_diss_bus, 'power_out1', pipe_diss_sink, 'power', label='e_pi_sink'),
+        PowerConnection(pump_psource, 'power', feed_pump, 'power', label='e_pump'),
+        ]
+    nw.add_conns(*power)
+
+    solve(site, f'main {main}')
+    if not nw.converged:
+        raise Exception(f'Steam main {main} bar did not converge.')
+
+
+def check_segments(consumers):
+    '''
+    Check the segment columns of the consumer table: every consumer of a segment must have the same
+    segment_length and segment_insulation_thickness (default is its insulation_thickness).
+    '''
+    if 'segment' not in consumers or consumers['segment'].isna().all():
+        return
+    if 'segment_length' not in consumers:
+        raise ValueError('Consumer table with segments is missing the column segment_length.')
+    consumers = _fill_segments(consumers)
+    grouped = consumers[consumers['segment'].notna()].groupby('segment')
+    for column in SEGMENT_COLUMNS:
+        values = grouped[column].nunique(dropna=False)
+        if (values > 1).any() or grouped[column].apply(lambda v: v.isna().any()).any():
+            raise ValueError(f'{column} must be set and the same for all consumers of the segments '
+                             f'{sorted(values.index[values != 1])}.')
+
+
+def _fill_segments(consumers):
+    consumers = consumers.copy()
+    if 'segment' not in consumers:
+        consumers['segment'] = None
+    for column in SEGMENT_COLUMNS:
+        if column not in consumers:
+            consumers[column] = np.nan
+    consumers['segment_insulation_thickness'] = (consumers['segment_insulation_thickness']
+                                                 .fillna(consumers['insulation_thickness']))
+    return consumers
+
+
+def assign_mains(consumers, mains):
+    '''
+    Needed pressure and serving steam main (lowest main above 1.01 * needed pressure) of every consumer.
+    All consumers of a segment are served by the main of the consumer with the highest needed pressure.
+    Returns a copy of consumers with the columns needed_pressure and main. A missing condensate_length
+    is set to the pipe_length, missing segment columns are added.
+    '''
+    consumers = _fill_segments(consumers)
+    if 'condensate_length' not in consumers:
+        consumers['condensate_length'] = consumers['pipe_length']
+    consumers['condensate_length'] = consumers['condensate_length'].fillna(consumers['pipe_length'])
+    consumers['needed_pressure'] = snpr.needed_pressure(consumers['needed_temperature'].to_numpy(dtype=float))
+    mains = np.sort(mains)
+    index = np.searchsorted(mains, consumers['needed_pressure'].to_numpy() * 1.01)
+    if (index == len(mains)).any():
+        names = list(consumers['name'][index == len(mains)])
+        raise ValueError(f'Needed pressure of the consumers {names} is larger than the highest steam main.')
+    consumers['main'] = mains[index]
+    segmented = consumers['segment'].notna()
+    consumers.loc[segmented, 'main'] = consumers[segmented].groupby('segment')['main'].transform('max')
+    return consumers
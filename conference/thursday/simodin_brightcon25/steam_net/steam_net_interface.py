@@ -3,9 +3,28 @@ from tespy.networks import Network
 from tespy.connections import  Ref
 
 from simodin import interface as link
+import logging
+import math
+import os
 from . import steam_network_model as snwm
+from . import sweep as snsw
+from . import warm_start as snws
+from . import templates as sntc
+from . import properties as snpr
+from . import surrogate as snsu
+from . import monte_carlo as snmc
+from . import instrumentation as snin
+from . import aio as snaio
+from . import result_store as snrs
+from . import bw_link as snbw
+from . import time_series as snts
+from . import sensitivity as snse
+from . import regime_map as snrm
+from . import flow_plan as snfp
+from . import bw_export as snbe
+from . import activity_index as snai
+import pandas as pd
 
-from CoolProp.CoolProp import PropsSI
 import numpy as np 
 import matplotlib.pyplot as plt
 from fluprodia import FluidPropertyDiagram
@@ -13,6 +32,8 @@ from fluprodia import FluidPropertyDiagram
 
 import copy
 
+logger = logging.getLogger(__name__)
+
 class steam_net(link.SimModel):
     reference={ 
         'type': 'misc',
@@ -59,6 +80,14 @@ class steam_net(link.SimModel):
         self.E_hs=0
 
         self.converged = False
+        self.solutions = None # SolutionIndex for warm started recalculation, see enable_warm_start()
+        self.templates = None # TemplateCache of solved networks per topology, see use_templates()
+        self.topology_hint = None # known topology of the next point, skips the topology detection if set
+        self.regime_map = None # RegimeMap, see use_regime_map()
+        self.surrogate = None
+        self.instrumentation = None # SolveMetrics, see instrument()
+        self.result_store = None # ResultStore, see use_result_store()
+        self.flow_plan = snfp.FlowPlan() # compiled evaluation of the flow amounts
         self._init_mains()
         #self._calc_mains()
         self.model= Network()
@@ -74,15 +103,36 @@ class steam_net(link.SimModel):
         '''
 
         self._calc_mains()
+        if self.templates is not None:
+            self.release_network()
+        if self._load_stored():
+            return
+        known = self.regime_map.predict_one(self.params) if self.regime_map is not None else None
+        hint = known or self.topology_hint
+        if hint is not None and self._solve_from_template(hint):
+            self.converged=True
+            self._result()
+            self._store_solution()
+            self._store_result()
+            return
+
+        self.model= Network()
         i=0
         while i < 1:
             try:
-                snwm.create_steam_net(self)
+                snwm.create_steam_net(self, known, self._warm_state(known))
+                if known is not None and snwm.classify_topology(self.model.get_conn('c022').x.val) != known:
+                    logger.info(f'Regime map topology {known} does not match, rebuild the steam net.')
+                    self.model= Network()
+                    snwm.create_steam_net(self, state=self._warm_state())
             except Exception as e:
-                print(e)
+                logger.warning(f'Steam net calculation failed: {e}')
+                self._report_failure('build', e)
             else:
                 self.converged=True
                 self._result()
+                self._store_solution()
+                self._store_result()
                 break
 
             i+=1
@@ -92,6 +142,136 @@ class steam_net(link.SimModel):
         #self.define_flows()
     
     
+    def sweep(self, points, max_workers=None, chunksize=1):
+        '''
+        Solve the model for every parameter set in points on a process pool.
+        points: DataFrame with one parameter set per row or dict of parameter lists, combined to a full grid
+        max_workers: number of worker processes, default is the number of cpus
+        chunksize: number of points solved in one worker task
+        The current params are used as base parameters of every point.
+        Returns a DataFrame with the parameters, result factors and converged flag of each point.
+        Failed points are kept with converged=False and the error message.
+        '''
+        return snsw.run_sweep(points, type(self), self.params, self.name, max_workers, chunksize, self.regime_map)
+
+    def iter_sweep(self, points, max_workers=None, chunksize=1):
+        '''
+        Same as sweep(), but yields the result rows as soon as they are solved.
+        '''
+        yield from snsw.iter_sweep(points, type(self), self.params, self.name, max_workers, chunksize,
+                                   self.regime_map)
+
+    def async_pool(self, max_workers=None, timeout=None):
+        '''
+        Bounded pool of worker processes for concurrent evaluations from asyncio, see aio.AsyncSteamNet.
+        The current params are used as base parameters of all workers.
+        '''
+        return snaio.AsyncSteamNet(type(self), self.params, self.name, max_workers, timeout)
+
+    def calculate_mains(self, interface=None, max_workers=None):
+        '''
+        Calculate the results and flow amounts for every steam main and fill main_dict.
+        Each main is evaluated for a consumer at the saturation temperature of main pressure/1.05,
+        the highest needed temperature served by this main. The needed temperatures of all mains are
+        looked up in one property call. The mains are then split into chunks of neighbouring pressures,
+        one chunk per worker process. Within a chunk the mains are solved one after the other: the
+        network template, the topology hint and the converged boiler and turbine state of the previous
+        main are reused for the next one (templates and warm start of the sweep() workers), only the
+        main side of the network is recalculated. With max_workers=1 all mains share this work,
+        with one worker per main all mains are solved in parallel from scratch.
+        interface: modelInterface with calculated background impact (calculate_background_impact()),
+            if passed the impact per unit of the reference flow is added for each main
+        max_workers: number of worker processes, default is the number of cpus
+        Returns a DataFrame with one row per main. Mains, which did not converge, have no impact.
+        '''
+        mains = self.params['mains']
+        temperatures = snpr.props('T', 'P', np.array(mains)*1E5/1.05, 'Q', 0) - 273 # inverse of _calc_pressure
+        chunksize = math.ceil(len(mains) / min(max_workers or os.cpu_count() or 1, len(mains)))
+        results = self.sweep(pd.DataFrame({'needed_temperature': np.floor(temperatures*100)/100}), max_workers,
+                             chunksize)
+        if interface is not None:
+            factors = snbw.unit_factors(interface)
+
+        skip = set(snsw.RESULT_COLUMNS) | {'needed_temperature', 'converged', 'topology', 'error'}
+        for pres, (_, row) in zip(mains, results.iterrows()):
+            entry = self.main_dict[str(pres)]
+            entry['needed_temperature'] = row['needed_temperature']
+            entry['results'] = {col: row[col] for col in snsw.RESULT_COLUMNS + ['converged', 'topology']}
+            entry['flows'] = {col: row[col] for col in row.index if col not in skip}
+            if interface is not None:
+                entry['impact'] = snbw.impact_per_unit(interface, entry['flows'], factors) if row['converged'] else None
+
+        table = {}
+        for pres in mains:
+            entry = self.main_dict[str(pres)]
+            row = {'temperature': entry['temperature'], 'needed_temperature': entry['needed_temperature']}
+            row |= entry['results'] | entry['flows']
+            row |= {f'impact {cat}': value for cat, value in (entry['impact'] or {}).items()}
+            table[pres] = row
+        return pd.DataFrame.from_dict(table, orient='index')
+
+    def time_series(self, heat=None, Tamb=None, wind_velocity=None, design_params=None, timestep=3600):
+        '''
+        Evaluate hourly (or other timestep) profiles of heat, Tamb and wind_velocity.
+        The network is designed once at the peak heat and every timestep is an offdesign solve
+        with fixed pipe diameters, warm started from the previous timestep.
+        Returns a time_series.TimeSeriesResult with the result factors and flow amounts as arrays
+        and the annual aggregates (aggregates()).
+        '''
+        return snts.run_time_series(self, heat, Tamb, wind_velocity, design_params, timestep)
+
+    def build_regime_map(self, bounds, levels=3, depth=4, max_workers=None, path=None):
+        '''
+        Build the topology map over the bounds of the parameter axes by adaptive bisection of the
+        topology boundaries, see regime_map.RegimeMap.build(). The map is used by calculate_model()
+        and sweep() afterwards and saved to path if passed.
+        bounds: dict of axis name and (lower, upper), e.g. of the axes in regime_map.REGIME_AXES
+        '''
+        self.regime_map = None
+        regime_map = snrm.RegimeMap.build(self, bounds, levels, depth, max_workers)
+        if path is not None:
+            regime_map.save(path)
+        self.regime_map = regime_map
+        return regime_map
+
+    def use_regime_map(self, path):
+        '''
+        Load a regime map built for the current params.
+        '''
+        self.regime_map = snrm.RegimeMap.load(path, self.params)
+        return self.regime_map
+
+    def export_variants(self, interface, variants, database='simodin_db', max_workers=None):
+        '''
+        Solve the variants and write all their datasets to brightway at once, see bw_export.export_variants().
+        Datasets are identified by the parameter hash, unchanged datasets are not written again.
+        interface: modelInterface of this model with linked flows
+        '''
+        return snbe.export_variants(interface, variants, database, max_workers)
+
+    def link_defaults(self, interface, databases, path=None, locations=(), overwrite=False):
+        '''
+        Link the flows of this model to the activities of their default_name and default_code with
+        interface.add_dataset(), see activity_index.link_defaults().
+        interface: modelInterface of this model
+        databases: names of the brightway databases to link against
+        path: npz file of the activity index, rebuilt if missing or outdated
+        locations: preferred locations of the linked activities
+        Returns a dict of flow name and linked node, None for flows without a match.
+        '''
+        if not hasattr(self, '_technosphere'):
+            self.define_flows()
+        index = snai.ActivityIndex.load(databases, path)
+        return snai.link_defaults(interface, index, locations, overwrite=overwrite)
+
+    def sensitivities(self, params=None, rel_step=1E-4):
+        '''
+        Local derivatives of the result factors and flow amounts with respect to params from the
+        Jacobian of the converged solve, see sensitivity.local_sensitivities().
+        Returns a DataFrame with one row per output and one column per parameter.
+        '''
+        return snse.local_sensitivities(self, params, rel_step)
+
     def define_flows(self):
         if not self.converged:
             self.calculate_model()
@@ -101,7 +281,7 @@ class steam_net(link.SimModel):
                 name='steam generation',
                 source= None,
                 target=self,
-                amount= lambda:self.model.get_conn("e_boil").E._val*self.model.units.ureg.second ,
+                amount= self.flow_plan.amount(self, 'steam generation'),
                 type= link.technosphereTypes.input,
                 description= f'Steam generation for high pressure steam of 100 bar in large chemical plants. Without any distribution losses. If distribution losses are assumed in original dataset, correct them in this flow.',
                 default_name='heat production, natural gas, at industrial furnace >100kW'
@@ -110,7 +290,7 @@ class steam_net(link.SimModel):
                 name='electricity grid',
                 source= None,
                 target=self,
-                amount= lambda:self.model.get_conn("e_pump").E._val *self.model.units.ureg.second ,
+                amount= self.flow_plan.amount(self, 'electricity grid'),
                 type= link.technosphereTypes.input,
                 description= 'Electricity from grid, medium voltage.',
                 default_name= 'market for electricity, medium'
@@ -119,14 +299,14 @@ class steam_net(link.SimModel):
                 name='electricity substitution',
                 source= self,
                 target= None,
-                amount= lambda:-self.model.get_conn("e_turb_grid").E._val*self.model.units.ureg.second ,
+                amount= self.flow_plan.amount(self, 'electricity substitution'),
                 type= link.technosphereTypes.substitution,
                 default_name= 'market for electricity, medium'),
             'distributed steam':link.technosphere_edge(
                 name='distributed steam',
                 source= self,
                 target = None,
-                amount= lambda:(self.model.get_conn("e_heat_sink").E._val*self.model.units.ureg.second).to('megajoule'),
+                amount= self.flow_plan.amount(self, 'distributed steam'),
                 functional = True,
                 reference = True,
                 type= link.technosphereTypes.product,
@@ -139,30 +319,209 @@ class steam_net(link.SimModel):
             name= 'steam leak',
             source= self,
             target= None,
-            amount= lambda:(self.model.get_conn("c_leak").m._val*
-                     self.model.units.ureg.second).to('tonne').m *self.model.units.ureg('m^3'),
+            amount= self.flow_plan.amount(self, 'steam leak'),
             default_code= '51254820-3456-4373-b7b4-056cf7b16e01'
             )}
         
 
+    def flow_amounts(self):
+        '''
+        Amounts of all technosphere and biosphere flows as floats in the units returned by the flow amount functions.
+        '''
+        if not hasattr(self, '_technosphere'):
+            self.define_flows()
+        return dict(zip(self.flow_plan.names, self.flow_plan.evaluate(self.model)))
+
+    def fit_surrogate(self, points, holdout=0.2, max_workers=None, path=None):
+        '''
+        Fit a surrogate model on real solves of the points, see surrogate.SteamNetSurrogate.fit().
+        The surrogate is used by predict() afterwards and saved to path if passed.
+        '''
+        self.surrogate = snsu.SteamNetSurrogate.fit(self, points, holdout, max_workers)
+        if path is not None:
+            self.surrogate.save(path)
+        return self.surrogate
+
+    def load_surrogate(self, path):
+        '''
+        Load a surrogate trained for the current params.
+        '''
+        self.surrogate = snsu.SteamNetSurrogate.load(path, self.params)
+        return self.surrogate
+
+    def predict(self, points, max_workers=None):
+        '''
+        Result factors and flow amounts of the points from the surrogate. Points outside the
+        trained bounds are solved with the real model.
+        '''
+        if self.surrogate is None:
+            raise ValueError('No surrogate is fitted, run fit_surrogate() or load_surrogate() first.')
+        return self.surrogate.predict(points, self, max_workers)
+
+    def monte_carlo(self, distributions, n, seed=None, max_workers=None, surrogate=False):
+        '''
+        Propagate the uncertainty of params through the model flows, see monte_carlo.run_monte_carlo().
+        distributions: dict of parameter name and distribution, e.g. {'leakage_factor': scipy.stats.uniform(0.05, 0.05)}
+        n: number of samples
+        surrogate: use the fitted surrogate instead of real solves
+        Returns a MonteCarloResult with the flow amount arrays, which can be written to a brightway datapackage.
+        '''
+        return snmc.run_monte_carlo(self, distributions, n, seed, max_workers, surrogate=surrogate)
+
     def recalculate_model(self, **params):
 
+        if not isinstance(self.model, Network):
+            # loaded from the result store, no network to recalculate
+            self.calculate_model()
+            return
         self._calc_mains()
+        if self._load_stored():
+            return
         try:
             self.change_parameters()
         except Exception as e:
             raise Exception(e)
 
         self.converged = False
+        state = self._warm_state(self.topology)
+        if state is not None:
+            self.solutions.seed(self.model, state)
         try:
-            self.model.solve('design')
+            snwm.solve(self, 'recalculate')
         except Exception as e:
+            self._report_failure('recalculate', e)
             raise Exception(e)
         self._result()
         #self.calculate_impact()
         self.converged=True
+        self._store_solution()
+        self._store_result()
         self.old_nw = self.model
 
+    def _solve_from_template(self, topology):
+        '''
+        Solve the point with a cached network of the given topology. Returns False, if no network
+        is cached, the solve fails or the solved point does not belong to the topology.
+        '''
+        if self.templates is None:
+            return False
+        network = self.templates.pop(self.templates.key(self, topology))
+        if network is None:
+            return False
+        self.model = network
+        self.cond_inj = topology == 'cond_inj'
+        self.trap = topology == 'trap'
+        self.converged = False
+        try:
+            self.change_parameters()
+            state = self._warm_state(topology)
+            if state is not None:
+                self.solutions.seed(self.model, state)
+            snwm.solve(self, 'template')
+        except Exception as e:
+            logger.warning(f'Solve from template failed: {e}')
+            self._report_failure('template', e)
+            return False
+        return (self.model.converged and
+                snwm.classify_topology(self.model.get_conn('c022').x.val) == topology)
+
+    def use_templates(self, cache=None):
+        '''
+        Reuse solved networks: calculate_model() returns the previous network to the cache and solves
+        points of a known topology (topology_hint or regime map) with a cached network of this topology
+        instead of building a new one.
+        cache: TemplateCache to share between models, default is a new cache of this model
+        '''
+        self.templates = sntc.TemplateCache() if cache is None else cache
+        return self.templates
+
+    def release_network(self):
+        '''
+        Return the solved network to the template cache, so that following points of the same
+        topology can skip the network build. The model needs a new calculate_model() call afterwards.
+        '''
+        if (self.templates is not None and isinstance(self.model, Network)
+                and self.converged and self.model.converged):
+            self.templates.put(self.templates.key(self, self.topology), self.model)
+        self.model = Network()
+        self.converged = False
+
+    def instrument(self, metrics=None, callback=None):
+        '''
+        Attach a SolveMetrics object, which records wall time, iterations, residual, status and topology
+        of every solve and all failed calculations.
+        metrics: SolveMetrics to share between models, default is a new one
+        callback: function called with every record, used if no metrics are passed
+        Returns the attached SolveMetrics.
+        '''
+        return snin.attach(self, metrics, callback)
+
+    def uninstrument(self):
+        '''
+        Remove the attached SolveMetrics. TESPy's property methods are restored, when no other model is instrumented.
+        '''
+        snin.detach(self)
+
+    def _report_failure(self, stage, exception):
+        if self.instrumentation is not None:
+            self.instrumentation.failure(self, stage, exception)
+
+    def enable_warm_start(self, solutions=None):
+        '''
+        Seed every solve with the converged connection states of the nearest already solved parameter set:
+        recalculate_model(), the solve of a cached template network and the first solve of a new network
+        in calculate_model(). The later topology solves of a new network start from the first solve.
+        sweep() workers use a warm start index per process.
+        solutions: SolutionIndex to share between models, default is a new index
+        '''
+        self.solutions = snws.SolutionIndex() if solutions is None else solutions
+        if self.converged:
+            self._store_solution()
+
+    def _warm_state(self, topology=None):
+        if self.solutions is None:
+            return None
+        return self.solutions.nearest(self.params, topology)
+
+    def use_result_store(self, path):
+        '''
+        Persist every solved state in the ResultStore at path. Parameter sets, which are already stored,
+        are loaded in calculate_model() and recalculate_model() without solving.
+        '''
+        self.result_store = snrs.ResultStore(path)
+        return self.result_store
+
+    def _load_stored(self):
+        if self.result_store is None:
+            return False
+        stored = self.result_store.get(self.params)
+        if stored is None:
+            return False
+        self.model = snrs.StoredNetwork(stored)
+        self.cond_inj = stored.topology == 'cond_inj'
+        self.trap = stored.topology == 'trap'
+        self._result()
+        self.converged = True
+        return True
+
+    def _store_result(self):
+        if self.result_store is not None and self.model.converged:
+            if not hasattr(self, '_technosphere'):
+                self.define_flows()
+            self.result_store.put(self)
+
+    def _store_solution(self):
+        if self.solutions is not None and isinstance(self.model, Network) and self.model.converged:
+            self.solutions.add(self.params, self.model, self.topology)
+
+    @property
+    def topology(self):
+        if self.cond_inj:
+            return 'cond_inj'
+        elif self.trap:
+            return 'trap'
+        return 'plain'
+
 
     def change_parameters(self):
         # makeup_factor:
@@ -173,6 +532,10 @@ class steam_net(link.SimModel):
         
         muw2=self.model.get_conn('muw2')
 
+        #boiler and feedpump:
+        c04.set_attr(h=self.h_superheating_max_pressure)
+        self.model.get_conn('c5').set_attr(p=self.params['max_pressure'])
+
         self.model.get_comp('steam pipe').set_attr(
             Tamb = self.params['Tamb'], 
             L = self.params['pipe_length'],
@@ -191,12 +554,17 @@ class steam_net(link.SimModel):
         #muw
         muw.set_attr(m=Ref(c04, self.params['makeup_factor'], 0),)
         muw2.set_attr(T= self.params['Tamb'])
+        self.model.get_conn('c_blowdown').set_attr(m=Ref(c04, self.params['makeup_factor'], 0))
+        if self.trap:
+            self.model.get_conn('muw3').set_attr(T=self.params['Tamb'])
 
         #leakage_factor:
         self.model.get_conn('c_leak').set_attr(m=Ref(c022, self.params['leakage_factor'], 0))
 
         #needed pressure:
         self.model.get_conn('c01').set_attr(p = self.needed_pressure)
+        #steam main, might change if needed_temperature jumps between mains:
+        self.model.get_conn('c03').set_attr(p = self.main_pressure)
 
     def _result(self):
         c_leak = self.model.get_conn('c_leak')
@@ -235,28 +603,30 @@ class steam_net(link.SimModel):
         self.alloc_ex = (self.E_hs /(self.E_hs + self.E_bpt)).m
 
     def _calc_pressure(self):
-        self.needed_pressure= PropsSI('P','Q',0,'T',self.params['needed_temperature']+273,'IF97::water')*1E-5
+        self.needed_pressure= snpr.needed_pressure(self.params['needed_temperature'])
         
     def _init_mains(self):
         self.params['mains'].sort()
         self.main_dict={}
-        for pres in self.params['mains']:
+        temperatures = snpr.saturation_temperature(self.params['mains']) # in °C
+        for pres, temp in zip(self.params['mains'], temperatures):
             self.main_dict[str(pres)] = {}
             self.main_dict[str(pres)]['pressure'] = pres
-            self.main_dict[str(pres)]['temperature'] =PropsSI('T', 'P', pres*1E5, 'Q', 1, 'IF97::water') - 273.15 # in °C
+            self.main_dict[str(pres)]['temperature'] = float(temp)
             self.main_dict[str(pres)]['impact'] = None
     def _calc_mains(self): 
         self.params['mains'].sort()
         self._calc_pressure()
-        s_superheating_max_pressure=  PropsSI('S','P',self.params['mains'][0]*1E5,'Q',1,'IF97::water') 
-        self.h_superheating_max_pressure=  PropsSI('H','P',self.params['max_pressure']*1E5,'S',s_superheating_max_pressure,'IF97::water') *1E-3
+        self.h_superheating_max_pressure= snpr.superheating_enthalpy(self.params['mains'][0], self.params['max_pressure'])
         if self.needed_pressure*1.05 > self.params['mains'][-1]:
             print('needed pressure larger than net pressure!')
         self.main_pressure = min((x for x in self.params['mains'] if x >= self.needed_pressure*1.01), default=None) 
 
-        for pres in self.params['mains']:
+        temperatures = snpr.saturation_temperature(self.params['mains']) # in °C
+        for pres, temp in zip(self.params['mains'], temperatures):
+            self.main_dict.setdefault(str(pres), {'impact': None})
             self.main_dict[str(pres)]['pressure'] = pres
-            self.main_dict[str(pres)]['temperature'] =PropsSI('T', 'P', pres*1E5, 'Q', 1, 'IF97::water') - 273.15 # in °C
+            self.main_dict[str(pres)]['temperature'] = float(temp)
 
     def plot_Ts(self):
         # Initial Setup
@@ -7,13 +7,79 @@ from tespy.components import (
 )
 
 from tespy.connections import Connection, Ref, PowerConnection
+import hashlib
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-def create_steam_net(steam_lca):
-    
-    logging.basicConfig(filename='logs.log', level=logging.INFO)
+# increase on every change of the network topology or equations, invalidates stored surrogates and results:
+MODEL_VERSION = 1
+
+# parameter sets of the three topologies. The detection solve never selects 'plain' for a converged
+# state (x at c022 is 1 for superheated steam), so the plain network is only built with a known
+# topology; its point is one where the plain network converges with a pressure drop at the valve.
+TOPOLOGY_POINTS = {
+    'plain': {'needed_temperature': 160, 'pipe_length': 1000, 'insulation_thickness': 0.1},
+    'cond_inj': {'needed_temperature': 180, 'pipe_length': 1000, 'insulation_thickness': 0.1},
+    'trap': {'needed_temperature': 180, 'pipe_length': 10000, 'insulation_thickness': 0.01},
+    }
+
+def base_magnitude(value):
+    '''Magnitude of pint quantities in SI base units, other values are returned unchanged.'''
+    if hasattr(value, 'to_base_units'):
+        return value.to_base_units().magnitude
+    return value
+
+def _normalize(value):
+    # numbers as float (4 and 4.0, numpy scalars and pint quantities hash alike), lists elementwise
+    value = base_magnitude(value)
+    if hasattr(value, 'tolist') and not isinstance(value, str):
+        value = value.tolist() # numpy scalars and arrays
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def params_hash(params):
+    '''Hash of the parameter dict and the model version. Numbers are compared as floats.'''
+    normalized = {key: _normalize(value) for key, value in params.items()}
+    text = json.dumps([MODEL_VERSION, normalized], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def classify_topology(x):
+    '''
+    Topology variant needed for the steam quality x at the end of the steam pipe (c022):
+    superheated steam -> 'cond_inj', wet steam -> 'trap', else 'plain'.
+    '''
+    if x in [-1,1]:
+        return 'cond_inj'
+    elif 0< x <1:
+        return 'trap'
+    return 'plain'
+
+def solve(steam_lca, stage, mode='design', **kwargs):
+    '''
+    Solve the network of steam_lca and report the solve to its instrumentation, if attached.
+    '''
+    logger.info(f'Start {stage} solve')
+    start = time.perf_counter()
+    try:
+        steam_lca.model.solve(mode, **kwargs)
+    finally:
+        if steam_lca.instrumentation is not None:
+            steam_lca.instrumentation.solve(steam_lca, stage, time.perf_counter() - start)
+
+def create_steam_net(steam_lca, topology=None, state=None):
+    '''
+    Build and solve the steam net of steam_lca.
+    topology: known topology ('plain', 'cond_inj', 'trap'), e.g. from a RegimeMap. If passed, the
+    solve to detect the state of the steam at c022 is skipped and the topology is built directly.
+    state: converged connection states of a similar point (SolutionIndex.nearest()), used as starting
+    values of the first solve.
+    '''
     steam_lca.cond_inj = False
     steam_lca.trap=False
     steam_lca.converged =False
@@ -158,19 +224,23 @@ def create_steam_net(steam_lca):
                            e_heat_sink, 
                            e_pump
     )
-    logger.info('Start first solve')
-    steam_lca.model.solve('design')
+    if state is not None:
+        from .warm_start import SolutionIndex
+        SolutionIndex.seed(steam_lca.model, state)
+    solve(steam_lca, 'first')
 
     #2. Run: 
 
     muw.set_attr(T=None)
     muw.set_attr(T=Ref(c2, 1, -20))
-    logger.info('Start second solve')
-    steam_lca.model.solve('design')
+    if topology in (None, 'plain'):
+        solve(steam_lca, 'second')
 
     #3. Run: implement condensate injection:
    
-    if c022.x.val in [-1,1] :
+    if topology is None:
+        topology = classify_topology(c022.x.val)
+    if topology == 'cond_inj':
         steam_lca.model.del_conns(c01, c1)
         c01= Connection(valve, 'out1', merge_injection, 'in1', label='c01')
         cond_3 = Connection(injection_source, 'out1', merge_injection, 'in2')
@@ -188,15 +258,14 @@ def create_steam_net(steam_lca):
                         fluid={"H2O": 1}, 
                         )
         cond_5.set_attr(x=1)
-        logger.info('Start third solve')
-        steam_lca.model.solve('design')
+        solve(steam_lca, 'third')
         steam_lca.cond_inj =True
     
-    elif 0< c022.x.val <1:
+    elif topology == 'trap':
         merge.set_attr(num_in=4)
         steam_lca.model.del_conns(c02)
         muw3 = Connection(makeup_trap, 'out1', merge, 'in4', label='muw3')
-        c023= Connection(steam_leak, 'out1', cond_trap, 'in1')
+        c023= Connection(steam_leak, 'out1', cond_trap, 'in1', label='c02') # replaces c02, used in _result()
         c024= Connection(cond_trap, 'out2', valve, 'in1')
         c_trap_waste = Connection(cond_trap, 'out1', cond_waste, 'in1', 'c_trap_waste ')
         
@@ -205,7 +274,6 @@ def create_steam_net(steam_lca):
         muw3.set_attr(m=Ref(c_trap_waste, 1, 0), T=steam_lca.params['Tamb'],
                       fluid={"H2O": 1}, 
                       )
-        logger.info('Start third solve')
-        steam_lca.model.solve('design')
+        solve(steam_lca, 'third')
         steam_lca.trap =True
 
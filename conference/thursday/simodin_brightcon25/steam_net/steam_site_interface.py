@@ -0,0 +1,230 @@
+
+from tespy.networks import Network
+import pandas as pd
+
+from simodin import interface as link
+import logging
+from . import site_network_model as snsm
+from . import properties as snpr
+from . import flow_plan as snfp
+from . import bw_link as snbw
+from . import instrumentation as snin
+from .steam_net_interface import steam_net
+
+logger = logging.getLogger(__name__)
+
+# flows of every steam main, the distributed steam is a flow per consumer:
+MAIN_FLOWS = ['steam generation', 'electricity grid', 'electricity substitution', 'steam leak']
+
+
+class steam_site(link.SimModel):
+    reference = steam_net.reference
+    description = ('This SiModIn model calculates the impact of process heat from steam for every consumer '
+                   'of a site with one steam main per pressure level.')
+
+    def init_model(self, init_arg=None, **params):
+        '''
+        init_arg: consumer table (DataFrame or list of dicts) with the columns
+            name, heat (W), needed_temperature (°C), pipe_length (m), insulation_thickness (m)
+            and optional condensate_length (m), default is the pipe_length.
+            Consumers with the same optional segment share the steam and condensate line of
+            segment_length (m) and segment_insulation_thickness (m, default is the insulation_thickness)
+            from the main header, pipe_length is then the length of the branch after the segment.
+        '''
+        self.consumers = pd.DataFrame(init_arg)
+        missing = set(snsm.CONSUMER_COLUMNS) - set(self.consumers.columns)
+        if missing:
+            raise ValueError(f'Consumer table is missing the columns {sorted(missing)}.')
+        if self.consumers['name'].duplicated().any():
+            raise ValueError('Consumer names must be unique.')
+        snsm.check_segments(self.consumers)
+
+        # Steam net properties, the consumer specific ones are in the consumer table:
+        self.params = {
+            'makeup_factor': 0.05,
+            'Tamb': 20,
+            'leakage_factor': 0.075,
+            'mains': [4, 8, 16, 40],
+            'max_pressure': 130,
+            'wind_velocity': 3,
+            'environment_media': 'air',
+        } | params
+
+        self.h_superheating_max_pressure = 0
+        self.networks = {} # TESPy network per steam main
+        self.plans = {} # FlowPlan per steam main
+        self.consumer_results = None
+        self.converged = False
+        self.instrumentation = None # SolveMetrics, see instrument()
+        self.model = Network()
+        self.initialized = True
+
+    @property
+    def topology(self):
+        return 'site'
+
+    def instrument(self, metrics=None, callback=None):
+        '''
+        Attach a SolveMetrics object, which records every solve of the steam mains, see steam_net.instrument().
+        '''
+        return snin.attach(self, metrics, callback)
+
+    def uninstrument(self):
+        '''
+        Remove the attached SolveMetrics. TESPy's property methods are restored, when no other model is instrumented.
+        '''
+        snin.detach(self)
+
+    def calculate_model(self, **params):
+        '''
+        Build and solve one network per steam main with all consumers served by this main.
+        '''
+        self.params['mains'].sort()
+        self.h_superheating_max_pressure = snpr.superheating_enthalpy(self.params['mains'][0],
+                                                                      self.params['max_pressure'])
+        self.consumers = snsm.assign_mains(self.consumers, self.params['mains'])
+        self.converged = False
+        self.networks = {}
+        for main, consumers in self.consumers.groupby('main'):
+            self.model = Network()
+            try:
+                snsm.create_main_network(self, main, consumers)
+            except Exception as e:
+                logger.warning(f'Steam main {main} bar failed: {e}')
+                if self.instrumentation is not None:
+                    self.instrumentation.failure(self, f'main {main}', e)
+                raise Exception(f'Steam main {main} bar failed. Check the consumers and try again!') from e
+            self.networks[main] = self.model
+            self.plans[main] = snfp.FlowPlan(self._main_specs(consumers))
+        self.converged = True
+        self._result()
+
+    def recalculate_model(self, **params):
+        self.calculate_model()
+
+    @staticmethod
+    def _main_specs(consumers):
+        specs = {name: snfp.FLOW_SPECS[name] for name in MAIN_FLOWS}
+        for name in consumers['name']:
+            specs[f'distributed steam {name}'] = (f'e_heat_sink {name}',) + snfp.FLOW_SPECS['distributed steam'][1:]
+        return specs
+
+    def _result(self):
+        rows = []
+        self.main_amounts = {}
+        for main, network in self.networks.items():
+            plan = self.plans[main]
+            amounts = dict(zip(plan.names, plan.evaluate(network)))
+            self.main_amounts[main] = amounts
+            header = network.get_conn('c02').m.val_SI
+            makeup = network.get_conn('muw').m.val_SI
+            c_leak = network.get_conn('c_leak')
+            # heat lost with the leaked steam, replaced by make-up water (like steam_net)
+            leakage_loss = c_leak.m.val_SI * (c_leak.h.val_SI - network.get_conn('muw2').h.val_SI)
+            for consumer in self.consumers[self.consumers['main'] == main].itertuples(index=False):
+                name = consumer.name
+                m = network.get_conn(f's1 {name}').m.val_SI
+                share = m / header
+                heat = amounts[f'distributed steam {name}'] * 1E6 # W
+                # heat lost in the pipes (Q of the pipes is negative), shared segments by the steam mass flow:
+                pipe_loss = -(network.get_comp(f'steam pipe {name}').Q.val_SI
+                              + network.get_comp(f'condensate pipe {name}').Q.val_SI)
+                if pd.notna(consumer.segment):
+                    segment = consumer.segment
+                    pipe_loss -= (m / network.get_conn(f'g1 {segment}').m.val_SI
+                                  * (network.get_comp(f'steam segment {segment}').Q.val_SI
+                                     + network.get_comp(f'condensate segment {segment}').Q.val_SI))
+                rows.append({
+                    'name': name,
+                    'main': main,
+                    'segment': consumer.segment,
+                    'needed_pressure': consumer.needed_pressure,
+                    'steam_mass_flow': m,
+                    'share': share,
+                    'heat': heat,
+                    'elec_factor': abs(amounts['electricity substitution'] * share / heat),
+                    'boiler_factor': abs(amounts['steam generation'] * share / heat),
+                    'losses': (pipe_loss + leakage_loss * share) / heat,
+                    'watertreatment_factor': abs(makeup * share / heat),
+                    })
+        results = pd.DataFrame(rows).set_index('name')
+        # allocation key of define_flows() and consumer_impacts(): share of the boiler heat of the site
+        boiler = results['boiler_factor'] * results['heat']
+        results['allocationfactor'] = boiler / boiler.sum()
+        self.consumer_results = results
+
+    def define_flows(self):
+        if not self.converged:
+            self.calculate_model()
+
+        technosphere = {}
+        biosphere = {}
+        for main, plan in self.plans.items():
+            network = lambda main=main: self.networks[main]
+            technosphere[f'steam generation {main} bar'] = link.technosphere_edge(
+                name=f'steam generation {main} bar',
+                source=None,
+                target=self,
+                amount=plan.amount(self, 'steam generation', network),
+                type=link.technosphereTypes.input,
+                description=f'Steam generation for the {main} bar main, see steam_net.',
+                default_name='heat production, natural gas, at industrial furnace >100kW'
+                )
+            technosphere[f'electricity grid {main} bar'] = link.technosphere_edge(
+                name=f'electricity grid {main} bar',
+                source=None,
+                target=self,
+                amount=plan.amount(self, 'electricity grid', network),
+                type=link.technosphereTypes.input,
+                description='Electricity from grid, medium voltage.',
+                default_name='market for electricity, medium'
+                )
+            technosphere[f'electricity substitution {main} bar'] = link.technosphere_edge(
+                name=f'electricity substitution {main} bar',
+                source=self,
+                target=None,
+                amount=plan.amount(self, 'electricity substitution', network),
+                type=link.technosphereTypes.substitution,
+                default_name='market for electricity, medium'
+                )
+            biosphere[f'steam leak {main} bar'] = link.biosphere_edge(
+                name=f'steam leak {main} bar',
+                source=self,
+                target=None,
+                amount=plan.amount(self, 'steam leak', network),
+                default_code='51254820-3456-4373-b7b4-056cf7b16e01'
+                )
+            for name in self.consumers['name'][self.consumers['main'] == main]:
+                technosphere[f'distributed steam {name}'] = link.technosphere_edge(
+                    name=f'distributed steam {name}',
+                    source=self,
+                    target=None,
+                    amount=plan.amount(self, f'distributed steam {name}', network),
+                    functional=True,
+                    reference=name == self.consumers['name'].iloc[0],
+                    type=link.technosphereTypes.product,
+                    allocationfactor=float(self.consumer_results.loc[name, 'allocationfactor']),
+                    model_unit='MJ',
+                    description=f'Distributed steam at consumer {name}, allocated by its share of the boiler heat.'
+                    )
+        self.technosphere = technosphere
+        self.biosphere = biosphere
+
+    def consumer_impacts(self, interface):
+        '''
+        Impact per MJ of distributed steam of every consumer. The flows of all steam mains are
+        allocated to the consumers by the allocationfactor of consumer_results, their share of
+        the boiler heat of the site, like the allocation of define_flows().
+        interface: modelInterface with linked datasets and calculated background impact (calculate_background_impact())
+        Returns a DataFrame with one row per consumer and one column per impact category.
+        '''
+        factors = snbw.unit_factors(interface)
+        amounts = {f'{flow} {main} bar': main_amounts[flow]
+                   for main, main_amounts in self.main_amounts.items() for flow in MAIN_FLOWS}
+        scores = snbw.impact_scores(interface, amounts, factors)
+        impacts = {}
+        for name, row in self.consumer_results.iterrows():
+            product = f'distributed steam {name}'
+            reference = self.main_amounts[row['main']][product] * factors[product]
+            impacts[name] = {cat: score * row['allocationfactor'] / reference for cat, score in scores.items()}
+        return pd.DataFrame.from_dict(impacts, orient='index')
@@ -0,0 +1,182 @@
+'''
+Surrogate of the steam net for fast evaluation of many parameter sets, e.g. in
+Monte Carlo LCA.
+
+The surrogate interpolates the result factors and flow amounts of real
+calculate_model() runs with radial basis functions over the swept parameter
+axes. A part of the runs is held out to report the interpolation error.
+Queries outside the trained bounds are solved with the real model.
+
+The stored artifact is versioned by MODEL_VERSION and the hash of all not
+swept model parameters, so it is not used for another network setup.
+'''
+import json
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import RBFInterpolator
+
+from . import sweep as snsw
+from .steam_network_model import MODEL_VERSION, base_magnitude, params_hash
+
+_NON_OUTPUTS = ['converged', 'error', 'topology']
+
+
+def _as_frame(points):
+    if isinstance(points, pd.DataFrame):
+        return points
+    return pd.DataFrame(snsw._to_points(points))
+
+
+class SteamNetSurrogate:
+    '''Radial basis function interpolator of the steam net results.
+
+    Args:
+        axes: names of the swept parameters.
+        outputs: names of the interpolated results.
+        X: training points, shape (n, len(axes)), in SI base units.
+        Y: training results, shape (n, len(outputs)).
+        version: version key of the model parameters, see version_key().
+        topologies: topologies of the training points.
+        errors: DataFrame of the held-out errors per output.
+        kernel: kernel of scipy.interpolate.RBFInterpolator.
+    '''
+    def __init__(self, axes, outputs, X, Y, version, topologies=(), errors=None, kernel='thin_plate_spline'):
+        self.axes = list(axes)
+        self.outputs = list(outputs)
+        self.X = np.asarray(X, dtype=float)
+        self.Y = np.asarray(Y, dtype=float)
+        self.version = version
+        self.topologies = sorted(set(topologies))
+        self.errors = errors
+        self.kernel = kernel
+        self.lower = self.X.min(axis=0)
+        self.upper = self.X.max(axis=0)
+        self._scale = self.upper - self.lower
+        self._scale[self._scale == 0] = 1
+        self._interpolator = RBFInterpolator(self._scaled(self.X), self.Y, kernel=kernel)
+
+    @staticmethod
+    def version_key(params, axes):
+        '''Hash of the model version and of all parameters, which are not swept.'''
+        return params_hash({key: value for key, value in params.items() if key not in axes})
+
+    def _scaled(self, X):
+        return (X - self.lower) / self._scale
+
+    def _matrix(self, points):
+        return points[self.axes].map(base_magnitude).to_numpy(dtype=float)
+
+    @classmethod
+    def fit(cls, model, points, holdout=0.2, max_workers=None, seed=0):
+        '''Solve the points with the real model and fit the surrogate.
+
+        Args:
+            model: steam_net instance, whose params are used as base parameters.
+            points: training points, DataFrame or dict of parameter lists (full grid).
+            holdout: share of the converged points used to measure the interpolation error.
+            max_workers: number of worker processes of the sweep.
+            seed: seed of the holdout selection.
+
+        Returns:
+            SteamNetSurrogate fitted on the not held out points.
+        '''
+        points = _as_frame(points)
+        axes = list(points.columns)
+        results = model.sweep(points, max_workers)
+        results = results[results['converged']]
+        outputs = [col for col in results.columns if col not in axes + _NON_OUTPUTS]
+        X = results[axes].map(base_magnitude).to_numpy(dtype=float)
+        Y = results[outputs].to_numpy(dtype=float)
+
+        test = np.random.default_rng(seed).random(len(X)) < holdout
+        if (~test).sum() < len(axes) + 2:
+            raise ValueError(f'{len(results)} of {len(points)} training points converged, {(~test).sum()} are left '
+                             f'for training after the holdout, at least {len(axes) + 2} are needed.')
+        surrogate = cls(axes, outputs, X[~test], Y[~test],
+                        version=cls.version_key(model.params, axes),
+                        topologies=results['topology'])
+        if test.any():
+            surrogate.errors = surrogate.error(X[test], Y[test])
+        return surrogate
+
+    def error(self, X, Y):
+        '''Mean absolute, maximum absolute and maximum relative error per output on the solved points X, Y.'''
+        diff = self._interpolator(self._scaled(X)) - Y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel = np.where(Y != 0, np.abs(diff / Y), np.nan)
+        return pd.DataFrame({
+            'mean_abs': np.abs(diff).mean(axis=0),
+            'max_abs': np.abs(diff).max(axis=0),
+            'max_rel': np.nanmax(rel, axis=0),
+            }, index=self.outputs)
+
+    def in_bounds(self, X):
+        return np.all((X >= self.lower) & (X <= self.upper), axis=1)
+
+    def predict(self, points, model=None, max_workers=None):
+        '''Interpolate the outputs of the points.
+
+        Args:
+            points: DataFrame or dict of parameter lists with all axes of the surrogate.
+            model: steam_net instance to solve the points outside of the trained bounds.
+                If None, these points are returned as NaN.
+            max_workers: number of worker processes for the real solves.
+
+        Returns:
+            DataFrame of the outputs with the column 'surrogate', False for really solved points.
+        '''
+        points = _as_frame(points)
+        X = self._matrix(points)
+        inside = self.in_bounds(X)
+        result = pd.DataFrame(np.nan, index=points.index, columns=self.outputs)
+        if inside.any():
+            result.loc[inside, self.outputs] = self._interpolator(self._scaled(X[inside]))
+        if model is not None and not inside.all():
+            # the flow columns are missing, if no point converged
+            solved = model.sweep(points[~inside], max_workers).reindex(columns=self.outputs)
+            result.loc[~inside, self.outputs] = solved.to_numpy(dtype=float)
+        result['surrogate'] = inside
+        return result
+
+    def predict_one(self, **params):
+        '''Outputs of a single parameter set as dict. Raises ValueError outside of the trained bounds.'''
+        x = np.array([[float(base_magnitude(params[key])) for key in self.axes]])
+        if not self.in_bounds(x)[0]:
+            raise ValueError(f'{params} is outside of the trained bounds.')
+        return dict(zip(self.outputs, self._interpolator(self._scaled(x))[0]))
+
+    def save(self, path):
+        '''Save training data and metadata as npz file.'''
+        meta = {
+            'model_version': MODEL_VERSION,
+            'version': self.version,
+            'axes': self.axes,
+            'outputs': self.outputs,
+            'topologies': self.topologies,
+            'kernel': self.kernel,
+            'errors': None if self.errors is None else self.errors.to_dict(),
+            }
+        np.savez(path, X=self.X, Y=self.Y, meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path, params=None):
+        '''Load a saved surrogate.
+
+        Args:
+            path: path of the npz file.
+            params: model params to check the version against.
+
+        Raises:
+            ValueError: if the surrogate was trained for another model version or other parameters.
+        '''
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            X, Y = data['X'], data['Y']
+        if meta['model_version'] != MODEL_VERSION:
+            raise ValueError(f"Surrogate was trained with model version {meta['model_version']}, "
+                             f'current version is {MODEL_VERSION}.')
+        if params is not None and cls.version_key(params, meta['axes']) != meta['version']:
+            raise ValueError('Surrogate was trained for other model parameters.')
+        errors = None if meta['errors'] is None else pd.DataFrame(meta['errors'])
+        return cls(meta['axes'], meta['outputs'], X, Y, meta['version'], meta['topologies'], errors, meta['kernel'])
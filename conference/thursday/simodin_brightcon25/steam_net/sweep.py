@@ -0,0 +1,122 @@
+'''
+Parameter sweeps of the steam net model on a process pool.
+
+Each point is solved in its own model instance, so the TESPy networks of
+different points never share state. Solved networks are returned to the
+template cache of the worker process and the topology of the last point is
+used as topology hint for the next one, unless a RegimeMap knows the topology
+of the point. Every solve is warm started from the nearest point already
+solved in the same worker. Failed points are kept in the result
+table with converged=False and the error message.
+'''
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .templates import template_cache
+from .warm_start import SolutionIndex
+
+RESULT_COLUMNS = ['elec_factor', 'boiler_factor', 'losses', 'alloc_ex', 'watertreatment_factor']
+
+# topology of the last solved point in this worker process:
+_topology_hint = None
+# RegimeMap of the sweep in this worker process:
+_regime_map = None
+# converged states of the points solved in this worker process, to warm start the next ones:
+_solutions = None
+
+
+def parameter_grid(**axes):
+    '''Full factorial grid of the passed parameter axes.
+
+    Args:
+        **axes: parameter name and list of values, e.g. needed_temperature=[150, 200, 250].
+
+    Returns:
+        DataFrame with one parameter set per row.
+    '''
+    return pd.DataFrame(list(itertools.product(*axes.values())), columns=list(axes))
+
+
+def _to_points(points):
+    if isinstance(points, pd.DataFrame):
+        return points.to_dict('records')
+    if isinstance(points, dict):
+        return parameter_grid(**points).to_dict('records')
+    return [dict(p) for p in points]
+
+
+def _init_worker(regime_map):
+    global _regime_map, _solutions
+    _regime_map = regime_map
+    _solutions = SolutionIndex()
+
+
+def _solve_point(model_cls, name, base_params, index, point):
+    global _topology_hint
+    row = {'index': index} | point
+    try:
+        model = model_cls(name)
+        model.init_model(**base_params)
+        model.use_templates(template_cache)
+        model.topology_hint = _topology_hint
+        model.regime_map = _regime_map
+        model.solutions = _solutions
+        model.calculate_model(**point)
+    except Exception as e:
+        row |= {col: np.nan for col in RESULT_COLUMNS}
+        row |= {'converged': False, 'error': str(e), 'topology': None}
+    else:
+        row |= {col: getattr(model, col) for col in RESULT_COLUMNS}
+        row |= {'converged': bool(model.converged and model.model.converged), 'error': None}
+        row['topology'] = _topology_hint = model.topology
+        row |= model.flow_amounts()
+        model.release_network()
+    return row
+
+
+def _solve_chunk(model_cls, name, base_params, chunk):
+    return [_solve_point(model_cls, name, base_params, i, p) for i, p in chunk]
+
+
+def iter_sweep(points, model_cls, base_params=None, name='steam net', max_workers=None, chunksize=1,
+               regime_map=None):
+    '''Solve the model for all points and yield the result rows as they are finished.
+
+    Args:
+        points: DataFrame with one parameter set per row, dict of parameter lists
+            (combined to a full grid) or iterable of parameter dicts.
+        model_cls: SimModel class to be solved, e.g. steam_net.
+        base_params: parameters passed to init_model() of every point.
+        name: model name of the instances.
+        max_workers: number of worker processes. Default is the number of cpus.
+        chunksize: number of points solved in one task. Larger chunks reduce the
+            scheduling overhead of many fast points.
+        regime_map: RegimeMap to know the topology of every point before the solve.
+
+    Yields:
+        dict with the point index, the parameters, the result factors, the converged flag, the error message,
+        the topology and the flow amounts.
+    '''
+    base_params = base_params or {}
+    points = list(enumerate(_to_points(points)))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(regime_map,)) as pool:
+        futures = [pool.submit(_solve_chunk, model_cls, name, base_params, points[i:i+chunksize])
+                   for i in range(0, len(points), chunksize)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def run_sweep(points, model_cls, base_params=None, name='steam net', max_workers=None, chunksize=1,
+              regime_map=None):
+    '''Solve the model for all points and collect the results in a tidy table.
+
+    See iter_sweep() for the arguments.
+
+    Returns:
+        DataFrame in the order of the passed points.
+    '''
+    rows = list(iter_sweep(points, model_cls, base_params, name, max_workers, chunksize, regime_map))
+    return pd.DataFrame(rows).sort_values('index').set_index('index')
@@ -0,0 +1,60 @@
+'''
+Cache of pre-built and pre-solved steam net networks per topology variant.
+
+create_steam_net() needs up to three solves to find out, if the steam at the
+point of use needs the plain, the condensate injection (cond_inj) or the
+condensate trap (trap) topology. If the topology of a point is already known,
+a cached network of this topology is reused with the new parameters and
+solved once, starting from its last converged state.
+
+A network is checked out of the cache while a model uses it, so two models
+never share one network. Models use a cache only after use_templates(); the
+sweep workers share the cache of their process (template_cache).
+'''
+from collections import OrderedDict
+
+TOPOLOGIES = ('plain', 'cond_inj', 'trap')
+
+
+class TemplateCache:
+    '''LRU cache of solved TESPy networks.
+
+    Args:
+        maxsize: maximum number of cached networks. The least recently used network is evicted first.
+    '''
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._networks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._networks)
+
+    @staticmethod
+    def key(steam_lca, topology):
+        # parameters, which are not changed by steam_net.change_parameters(), define the structure:
+        return (topology, steam_lca.params['environment_media'])
+
+    def pop(self, key):
+        '''Check out a network of key. Returns None if no network is cached.'''
+        for cached_key in reversed(self._networks):
+            if cached_key[0] == key:
+                self.hits += 1
+                return self._networks.pop(cached_key)
+        self.misses += 1
+        return None
+
+    def put(self, key, network):
+        '''Return a solved network to the cache.'''
+        self._networks[(key, id(network))] = network
+        self._networks.move_to_end((key, id(network)))
+        while len(self._networks) > self.maxsize:
+            self._networks.popitem(last=False)
+
+    def clear(self):
+        self._networks.clear()
+
+
+# cache of the sweep and asyncio worker processes:
+template_cache = TemplateCache()
@@ -0,0 +1,147 @@
+'''
+Time series (part load) evaluation of the steam net.
+
+The network is designed once, at the peak heat demand of the profiles, and
+saved as design case. The pipe diameters are fixed to their design values
+and the pressure ratios of the pipes become results. Every timestep is then
+an offdesign solve starting from the solution of the previous timestep,
+instead of a new design solve which would re-size the pipes every hour.
+
+The flow amounts of the steam net are rates per second of operation, the
+annual aggregates multiply them with the length of the timesteps.
+'''
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from tespy.networks import Network
+
+from .steam_network_model import solve
+from .sweep import RESULT_COLUMNS
+
+PROFILE_PARAMS = ['heat', 'Tamb', 'wind_velocity']
+PIPES = ['steam pipe', 'condensate pipe']
+
+
+class TimeSeriesResult:
+    '''Results of a time series evaluation.
+
+    Attributes:
+        profiles: dict of the parameter profiles as arrays.
+        columns: dict of the result factors and flow amounts as arrays, one value per timestep.
+            Timesteps which did not converge are nan.
+        converged: boolean array of the converged timesteps.
+        timestep: length of a timestep in seconds.
+        flows: names of the flow columns.
+    '''
+    def __init__(self, profiles, columns, converged, timestep, flows):
+        self.profiles = profiles
+        self.columns = columns
+        self.converged = converged
+        self.timestep = timestep
+        self.flows = flows
+
+    def to_frame(self):
+        return pd.DataFrame(self.profiles | self.columns | {'converged': self.converged})
+
+    def totals(self):
+        '''Flow amounts summed over all converged timesteps.'''
+        return {name: np.nansum(self.columns[name]) * self.timestep for name in self.flows}
+
+    def aggregates(self, weight='distributed steam'):
+        '''Annual totals of the flows and the result factors weighted by the flow weight.'''
+        weights = np.where(self.converged, np.nan_to_num(self.columns[weight]), 0)
+        factors = {}
+        for col in RESULT_COLUMNS:
+            values = np.nan_to_num(self.columns[col])
+            factors[col] = np.sum(values * weights) / np.sum(weights) if np.sum(weights) else np.nan
+        return {
+            'timesteps': len(self.converged),
+            'converged': int(self.converged.sum()),
+            'hours': len(self.converged) * self.timestep / 3600,
+            } | factors | self.totals()
+
+
+def _profiles(**profiles):
+    profiles = {name: np.atleast_1d(np.asarray(values, dtype=float))
+                for name, values in profiles.items() if values is not None}
+    unknown = set(profiles) - set(PROFILE_PARAMS)
+    if unknown:
+        raise ValueError(f'No time series parameters: {sorted(unknown)}, use {PROFILE_PARAMS}.')
+    lengths = {len(values) for values in profiles.values() if len(values) > 1}
+    if len(lengths) > 1:
+        raise ValueError(f'Profiles of different length: {sorted(lengths)}.')
+    n = lengths.pop() if lengths else 1
+    return n, {name: np.broadcast_to(values, n) for name, values in profiles.items()}
+
+
+def run_time_series(model, heat=None, Tamb=None, wind_velocity=None, design_params=None, timestep=3600):
+    '''Evaluate model for the profiles of heat, Tamb and wind_velocity.
+
+    Args:
+        model: steam_net instance, initialized with init_model().
+        heat, Tamb, wind_velocity: profiles as array or scalar, parameters not passed keep the model value.
+        design_params: parameters of the design point, default is the model params with the peak heat of the profile.
+        timestep: length of a timestep in seconds.
+
+    Returns:
+        TimeSeriesResult
+    '''
+    n, profiles = _profiles(heat=heat, Tamb=Tamb, wind_velocity=wind_velocity)
+    params = model.params.copy()
+    design = {'heat': profiles['heat'].max()} if 'heat' in profiles else {}
+    design |= design_params or {}
+
+    # the design case must be a solved TESPy network, not a stored result
+    result_store, model.result_store = model.result_store, None
+    try:
+        model.calculate_model(**design)
+    finally:
+        model.result_store = result_store
+    if not hasattr(model, '_technosphere'):
+        model.define_flows()
+    flows = list(model._technosphere | model._biosphere)
+
+    design_dir = tempfile.mkdtemp(prefix='steam_net_design_')
+    design_path = os.path.join(design_dir, 'design.json')
+    model.model.save(design_path)
+    design_pr = {}
+    for label in PIPES:
+        pipe = model.model.get_comp(label)
+        design_pr[label] = pipe.pr.val
+        pipe.set_attr(D=pipe.D.val, pr=None)
+
+    columns = {name: np.full(n, np.nan) for name in RESULT_COLUMNS + flows}
+    converged = np.zeros(n, dtype=bool)
+    try:
+        for i in range(n):
+            model.params.update({name: values[i].item() for name, values in profiles.items()})
+            model.change_parameters()
+            try:
+                solve(model, 'timestep', mode='offdesign', design_path=design_path, init_previous=True)
+                if not model.model.converged:
+                    continue
+                model._result()
+            except Exception as e:
+                model._report_failure('timestep', e)
+                continue
+            for col in RESULT_COLUMNS:
+                columns[col][i] = getattr(model, col)
+            for name, value in model.flow_amounts().items():
+                columns[name][i] = value
+            converged[i] = True
+    finally:
+        try:
+            # back to the design state of the network, solved again below if no exception is raised
+            for label in PIPES:
+                model.model.get_comp(label).set_attr(D='var', pr=design_pr[label])
+            model.params = params
+            model.converged = False
+        finally:
+            shutil.rmtree(design_dir, ignore_errors=True)
+    if isinstance(model.model, Network):
+        model.recalculate_model()
+
+    return TimeSeriesResult(profiles, columns, converged, timestep, flows)
@@ -0,0 +1,94 @@
+'''
+Index of converged states of the steam net for warm started solves.
+
+The states are stored per topology and keyed by the parameter vector of the
+solved point. A new solve is seeded with the values of all solver variables
+(m, p, h, E and the pipe diameters) of the nearest converged point instead of
+the generic initial guesses: the recalculation of a network, the solve of a
+cached template network and the first solve of a new network build. Sweep
+workers keep one index per process.
+'''
+import numpy as np
+
+from .steam_network_model import base_magnitude
+
+WARM_START_PARAMS = [
+    'needed_temperature',
+    'pipe_length',
+    'insulation_thickness',
+    'wind_velocity',
+    'Tamb',
+    'heat',
+    'makeup_factor',
+    'leakage_factor',
+    ]
+
+
+class SolutionIndex:
+    '''Nearest neighbour index of converged steam net states.
+
+    Args:
+        keys: parameter names spanning the parameter vector.
+        maxsize: maximum number of stored states per topology. The oldest states are dropped first.
+    '''
+    def __init__(self, keys=WARM_START_PARAMS, maxsize=1000):
+        self.keys = list(keys)
+        self.maxsize = maxsize
+        self._vectors = {}
+        self._states = {}
+
+    def __len__(self):
+        return sum(len(states) for states in self._states.values())
+
+    def vector(self, params):
+        return np.array([float(base_magnitude(params[key])) for key in self.keys])
+
+    @staticmethod
+    def state(network):
+        '''Values of all solver variables of the network: m, p, h of the connections, E of the power
+        connections and the variable component parameters (e.g. pipe diameters), in network units.'''
+        return {
+            'conns': {c.label: {key: var.val for key, var in c.get_variables().items()}
+                      for c in network.conns['object']},
+            'comps': {cp.label: {key: var.val for key, var in cp.get_variables().items()}
+                      for cp in network.comps['object']},
+            }
+
+    def add(self, params, network, topology):
+        '''Store the state of a converged network.'''
+        state = self.state(network)
+        vectors = self._vectors.setdefault(topology, [])
+        states = self._states.setdefault(topology, [])
+        vectors.append(self.vector(params))
+        states.append(state)
+        if len(states) > self.maxsize:
+            del vectors[0], states[0]
+
+    def nearest(self, params, topology=None):
+        '''Return the stored state closest to params or None if no state of this topology is stored.
+
+        The distance is measured on the parameter vector scaled by the value range of the stored points.
+        topology: None searches the states of all topologies, e.g. before the topology of a point is known.
+        '''
+        topologies = list(self._states) if topology is None else [topology]
+        vectors = [v for t in topologies for v in self._vectors.get(t, [])]
+        states = [s for t in topologies for s in self._states.get(t, [])]
+        if not states:
+            return None
+        vectors = np.array(vectors)
+        scale = np.ptp(vectors, axis=0)
+        scale[scale == 0] = 1
+        dist = np.linalg.norm((vectors - self.vector(params)) / scale, axis=1)
+        return states[int(np.argmin(dist))]
+
+    @staticmethod
+    def seed(network, state):
+        '''Set the starting values of all connections and component variables of the network, which are in state.'''
+        for c in network.conns['object']:
+            for key, value in state['conns'].get(c.label, {}).items():
+                c.get_attr(key).set_attr(val0=value)
+        for cp in network.comps['object']:
+            for key, value in state['comps'].get(cp.label, {}).items():
+                container = cp.get_attr(key)
+                if container.is_var:
+                    container.set_attr(val=value)
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def steam_net_cls():
+    pytest.importorskip('tespy')
+    pytest.importorskip('simodin')
+    from steam_net.steam_net_interface import steam_net
+    return steam_net
+
+
+@pytest.fixture
+def topology_points():
+    '''Parameter sets of the three topologies, see steam_network_model.TOPOLOGY_POINTS.'''
+    pytest.importorskip('tespy')
+    from steam_net.steam_network_model import TOPOLOGY_POINTS
+    return TOPOLOGY_POINTS
+
+
+@pytest.fixture
+def model(steam_net_cls):
+    model = steam_net_cls('steam net')
+    model.init_model()
+    yield model
+    model.uninstrument()
+
+
+@pytest.fixture
+def bw_project(tmp_path):
+    '''Current brightway project in a temporary directory with a small background database.'''
+    bd = pytest.importorskip('bw2data')
+    base_dir, logs_dir, project = bd.projects._base_data_dir, bd.projects._base_logs_dir, bd.projects.current
+    (tmp_path / 'logs').mkdir()
+    bd.projects.change_base_directories(tmp_path, tmp_path / 'logs', project_name='steam_net_test')
+    bd.Database('biosphere').write({
+        # code of the default_code of the steam leak
+        ('biosphere', '51254820-3456-4373-b7b4-056cf7b16e01'): {'name': 'Water', 'unit': 'cubic meter',
+                                                                'type': 'emission'},
+        })
+    bd.Database('background').write({
+        ('background', 'heat'): {'name': 'heat production, natural gas, at industrial furnace >100kW',
+                                 'unit': 'megajoule', 'location': 'GLO', 'exchanges': []},
+        ('background', 'electricity'): {'name': 'market for electricity, medium voltage',
+                                        'unit': 'kilowatt hour', 'location': 'DE', 'exchanges': []},
+        })
+    yield bd
+    bd.projects.change_base_directories(base_dir, logs_dir, project_name=project, update=False)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+
+def test_query(bw_project):
+    from steam_net.activity_index import ActivityIndex
+
+    index = ActivityIndex.build(['background', 'biosphere'])
+    assert len(index) == 3
+    assert list(index.query(location='DE')['name']) == ['market for electricity, medium voltage']
+    assert len(index.query('prefix', name='market for electricity')) == 1
+    assert len(index.query('contains', name='natural gas')) == 1
+    assert len(index.query(unit='megajoule', database='biosphere')) == 0
+    assert index.get(name='Water')['unit'] == 'cubic meter'
+    with pytest.raises(KeyError):
+        index.get('contains', name='e')
+    with pytest.raises(ValueError, match='not indexed'):
+        index.query(comment='x')
+
+
+def test_load_rebuilds(bw_project, tmp_path):
+    from steam_net.activity_index import ActivityIndex
+
+    path = tmp_path / 'index.npz'
+    databases = ['background', 'biosphere']
+    assert len(ActivityIndex.load(databases, path)) == 3
+
+    # outdated after a change of the database
+    bw_project.Database('background').new_node(code='steam', name='steam, in chemical industry', unit='kilogram').save()
+    assert not ActivityIndex.from_file(path).valid()
+    assert len(ActivityIndex.load(databases, path)) == 4
+
+    # older format without the modified timestamps and corrupt files are rebuilt
+    np.savez(path, id=np.arange(3))
+    assert len(ActivityIndex.load(databases, path)) == 4
+    path.write_bytes(b'no npz file')
+    assert len(ActivityIndex.load(databases, path)) == 4
+
+
+def test_link_defaults(model, bw_project, tmp_path):
+    from simodin import interface as link
+
+    model.calculate_model(needed_temperature=180)
+    interface = link.modelInterface('steam net', model)
+    linked = model.link_defaults(interface, ['background', 'biosphere'], tmp_path / 'index.npz')
+
+    assert {name: node['code'] for name, node in linked.items()} == {
+        'steam generation': 'heat',
+        'electricity grid': 'electricity',
+        'electricity substitution': 'electricity',
+        'steam leak': '51254820-3456-4373-b7b4-056cf7b16e01',
+        }
+    assert model._technosphere['steam generation'].source['code'] == 'heat'
+    assert model._technosphere['electricity substitution'].target['code'] == 'electricity'
+    # linked flows are kept
+    assert model.link_defaults(interface, ['background', 'biosphere'], tmp_path / 'index.npz') == {}
@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+
+
+def test_async_pool(model):
+    async def run():
+        async with model.async_pool(max_workers=1) as pool:
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.evaluate(timeout=0.01, needed_temperature=180)
+            # the timed out worker is replaced in the background
+            result, failed = await pool.map([{'needed_temperature': 180}, {'needed_temperature': 250}], timeout=120)
+            assert len(pool._workers) == 1
+        return result, failed
+
+    result, failed = asyncio.run(run())
+    assert result.converged and result.topology == 'cond_inj'
+    assert not failed.converged and failed.error
+    model.calculate_model(needed_temperature=180)
+    assert result.factors['elec_factor'] == pytest.approx(model.elec_factor, rel=1E-6)
@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.fixture
+def interface(model, bw_project):
+    from simodin import interface as link
+
+    model.calculate_model(needed_temperature=180)
+    model.define_flows()
+    interface = link.modelInterface('steam net', model)
+    interface.add_dataset('steam generation', bw_project.get_node(database='background', code='heat'))
+    for name in ['electricity grid', 'electricity substitution']:
+        interface.add_dataset(name, bw_project.get_node(database='background', code='electricity'))
+    interface.add_dataset('steam leak', bw_project.get_node(database='biosphere', name='Water'))
+    return interface
+
+
+def test_export_variants(interface, bw_project):
+    from steam_net.bw_export import variant_code
+    from steam_net.steam_network_model import params_hash
+
+    model = interface.model
+    variants = {'needed_temperature': [180, 190, 400]}
+    first = model.export_variants(interface, variants, database='variants', max_workers=2)
+
+    assert first['failed'] == [2]
+    assert first['written'] == 2 and first['unchanged'] == 0
+    node = bw_project.get_node(database='variants', code=first['codes'][0][0])
+    params = model.params | {'needed_temperature': 180}
+    assert node['params_hash'] == params_hash(params)
+    assert node['code'] == variant_code(params, 'distributed steam')
+    inputs = {exchange.input['code']: exchange['amount'] for exchange in node.technosphere()}
+    assert set(inputs) == {'heat', 'electricity'}
+    assert inputs['heat'] > 1
+    assert len(node.biosphere()) == 1
+    # brightway stores a process with production of itself as process with reference product
+    assert node['type'] in bw_project.labels.process_node_types
+    production = list(node.production())
+    assert len(production) == 1
+    assert production[0].input == node and production[0]['amount'] == 1
+
+    # a re-export writes nothing, a new variant is added to the existing database
+    second = model.export_variants(interface, {'needed_temperature': [180, 190, 200]}, database='variants',
+                                   max_workers=2)
+    assert second['written'] == 1 and second['unchanged'] == 2
+    assert len(bw_project.Database('variants')) == 3
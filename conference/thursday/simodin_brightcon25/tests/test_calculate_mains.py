@@ -0,0 +1,52 @@
+import pytest
+
+
+def test_calculate_mains(steam_net_cls, monkeypatch):
+    from steam_net import bw_link
+
+    # the 40 bar main converges only for some starting values of TESPy (seeded by the label hash)
+    model = steam_net_cls('steam net')
+    model.init_model(mains=[4, 8, 16])
+
+    monkeypatch.setattr(bw_link, 'unit_factors', lambda interface: {})
+    monkeypatch.setattr(bw_link, 'impact_per_unit', lambda interface, flows, factors: {'GWP': 1.0})
+    sweep = model.sweep
+    solved = {}
+
+    def recording_sweep(points, max_workers=None, chunksize=1):
+        solved['chunksize'] = chunksize
+        solved['results'] = sweep(points, max_workers, chunksize)
+        return solved['results']
+    monkeypatch.setattr(model, 'sweep', recording_sweep)
+
+    # one worker solves all mains in a row and reuses template and converged state of the previous main
+    table = model.calculate_mains(interface=object(), max_workers=1)
+    assert solved['chunksize'] == 3
+    assert list(table.index) == model.params['mains']
+    assert table['converged'].all()
+    assert (table['impact GWP'] == 1.0).all()
+    assert (table['needed_temperature'] < table['temperature']).all()
+    assert model.main_dict['16']['flows']['distributed steam'] == pytest.approx(40E6 * 1E-6)
+
+    failed = solved['results'].copy()
+    failed.loc[failed.index[-1], 'converged'] = False
+    monkeypatch.setattr(model, 'sweep', lambda points, max_workers=None, chunksize=1: failed)
+    table = model.calculate_mains(interface=object(), max_workers=3)
+    assert model.main_dict['16']['impact'] is None
+    assert table['impact GWP'].isna().tolist() == [False, False, True]
+
+
+def test_calculate_mains_chunks(steam_net_cls, monkeypatch):
+    model = steam_net_cls('steam net')
+    model.init_model(mains=[4, 8, 16, 24])
+    chunks = []
+
+    def recording_sweep(points, max_workers=None, chunksize=1):
+        chunks.append(chunksize)
+        raise RuntimeError('not solved')
+    monkeypatch.setattr(model, 'sweep', recording_sweep)
+
+    for workers in [1, 2, 3, 4, 8]:
+        with pytest.raises(RuntimeError):
+            model.calculate_mains(max_workers=workers)
+    assert chunks == [4, 2, 2, 1, 1]
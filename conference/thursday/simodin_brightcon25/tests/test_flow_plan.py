@@ -0,0 +1,27 @@
+import pytest
+
+
+def test_flow_amounts(model, topology_points):
+    model.calculate_model(**topology_points['cond_inj'])
+    network = model.model
+    amounts = model.flow_amounts()
+
+    assert amounts['distributed steam'] == pytest.approx(network.get_conn('e_heat_sink').E.val_SI * 1E-6)
+    assert amounts['electricity substitution'] == pytest.approx(-network.get_conn('e_turb_grid').E.val_SI)
+    assert amounts['steam leak'] == pytest.approx(network.get_conn('c_leak').m.val_SI * 1E-3)
+
+    amount = model.flow_plan.amount(model, 'distributed steam')()
+    assert str(amount.units) == 'megajoule'
+    assert amount.m == pytest.approx(amounts['distributed steam'])
+
+
+def test_rebind_new_network(model, topology_points):
+    model.calculate_model(**topology_points['cond_inj'])
+    first = model.flow_amounts()
+    model.calculate_model(**topology_points['trap'])
+    second = model.flow_amounts()
+
+    assert model.flow_plan.bind(model.model)[0] is model.model.get_conn('e_boil').E
+    assert second['steam leak'] == pytest.approx(model.model.get_conn('c_leak').m.val_SI * 1E-3)
+    assert second['steam generation'] != pytest.approx(first['steam generation'])
+    assert model.flow_plan.evaluate_many([model.model, model.model]).shape == (2, len(model.flow_plan.names))
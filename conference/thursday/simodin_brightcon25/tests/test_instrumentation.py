@@ -0,0 +1,46 @@
+def test_solve_records_count_tespy_property_calls(model):
+    metrics = model.instrument()
+    model.calculate_model(needed_temperature=180)
+
+    solves = [r for r in metrics.records if 'iterations' in r]
+    assert [r['stage'] for r in solves] == ['first', 'second', 'third']
+    assert all(r['converged'] for r in solves)
+    assert all(r['tespy_property_calls'] > 100 for r in solves)
+    assert all(r['coolprop_calls'] >= r['tespy_property_calls'] for r in solves)
+    assert metrics.summary().loc['first', 'solves'] == 1
+
+
+def test_failure_record(model):
+    metrics = model.instrument()
+    try:
+        model.calculate_model(needed_temperature=250)
+    except Exception:
+        pass
+    failures = [r for r in metrics.records if 'error' in r]
+    assert failures and failures[-1]['stage'] == 'build'
+
+
+def test_detach_restores_coolprop_wrapper(steam_net_cls):
+    from tespy.tools.fluid_properties.wrappers import CoolPropWrapper
+
+    from steam_net import instrumentation as snin
+
+    original = CoolPropWrapper.h_pT
+    first, second = steam_net_cls('first'), steam_net_cls('second')
+    first.init_model()
+    second.init_model()
+    metrics = first.instrument()
+    second.instrument(metrics)
+    assert CoolPropWrapper.h_pT is not original
+
+    first.uninstrument()
+    assert CoolPropWrapper.h_pT is not original
+    second.uninstrument()
+    second.uninstrument()
+    assert CoolPropWrapper.h_pT is original
+    assert first.instrumentation is None
+
+    # no calls are counted without attached metrics
+    calls = snin.tespy_calls
+    first.calculate_model(needed_temperature=180)
+    assert snin.tespy_calls == calls
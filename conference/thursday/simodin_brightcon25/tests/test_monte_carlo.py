@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+TEMPERATURES = [175, 180, 400] # the last draw fails
+
+
+def test_sample():
+    pytest.importorskip('scipy')
+    from scipy import stats
+
+    from steam_net.monte_carlo import sample
+
+    distributions = {
+        'Tamb': {'distribution': 'normal', 'loc': 20, 'scale': 5},
+        'leakage_factor': stats.uniform(0.05, 0.05),
+        'heat': [1E6, 2E6, 3E6, 4E6],
+        }
+    samples = sample(distributions, 4, seed=1)
+    assert samples.shape == (4, 3)
+    assert list(samples.columns) == list(distributions)
+    assert samples.equals(sample(distributions, 4, seed=1))
+    assert not samples.equals(sample(distributions, 4, seed=2))
+    assert samples['leakage_factor'].between(0.05, 0.1).all()
+    assert samples['heat'].tolist() == distributions['heat']
+
+    with pytest.raises(ValueError, match='Expected 3 sample values'):
+        sample(distributions, 3)
+    with pytest.raises(ValueError, match='Unknown distribution'):
+        sample({'Tamb': {'distribution': 'beta'}}, 3)
+
+
+def test_run_monte_carlo(model):
+    result = model.monte_carlo({'needed_temperature': TEMPERATURES}, 3, max_workers=2)
+
+    assert result.converged.tolist() == [True, True, False]
+    assert np.isnan(result.amounts('distributed steam')[2])
+    assert set(result.flows) == set(model.flow_plan.names)
+    model.calculate_model(needed_temperature=175)
+    assert result.amounts('steam generation')[0] == pytest.approx(model.flow_amounts()['steam generation'], rel=1E-6)
+    assert result.summary().loc['steam generation', 'mean'] == pytest.approx(
+        np.nanmean(result.amounts('steam generation')))
+
+
+def test_to_datapackage(model, bw_project):
+    from simodin import interface as link
+
+    from steam_net.bw_link import unit_factors
+
+    model.calculate_model(needed_temperature=180)
+    model.define_flows()
+    interface = link.modelInterface('steam net', model)
+    heat = bw_project.get_node(database='background', code='heat')
+    electricity = bw_project.get_node(database='background', code='electricity')
+    interface.add_dataset('steam generation', heat)
+    interface.add_dataset('electricity grid', electricity)
+    factors = unit_factors(interface)
+    node = bw_project.Database('background').new_node(code='steam net', name='steam net', unit='megajoule')
+    node.save()
+
+    result = model.monte_carlo({'needed_temperature': TEMPERATURES}, 3, max_workers=2)
+    dp = result.to_datapackage(interface, node, factors, name='mc')
+
+    indices = dp.get_resource('mc_technosphere_matrix.indices')[0]
+    data = dp.get_resource('mc_technosphere_matrix.data')[0]
+    assert indices.tolist() == [(heat.id, node.id), (electricity.id, node.id)]
+    assert data.shape == (2, 2)
+    assert dp.get_resource('mc_technosphere_matrix.flip')[0].all()
+    for j, temperature in enumerate(TEMPERATURES[:2]):
+        model.calculate_model(needed_temperature=temperature)
+        amounts = model.flow_amounts()
+        # MJ of heat and kWh of electricity per MJ of distributed steam
+        assert data[0, j] == pytest.approx(amounts['steam generation'] * 1E-6 / amounts['distributed steam'], rel=1E-6)
+        assert data[1, j] == pytest.approx(amounts['electricity grid'] / 3.6E6 / amounts['distributed steam'],
+                                           rel=1E-6)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def snpr():
+    pytest.importorskip('CoolProp')
+    from steam_net import properties
+
+    properties.clear_cache()
+    yield properties
+    properties.clear_cache()
+
+
+def test_array_matches_scalar(snpr):
+    temperatures = np.array([[400., 450.], [500., 400.]])
+    array = snpr.props('P', 'Q', 0, 'T', temperatures)
+    assert array.shape == (2, 2)
+    for index, T in np.ndenumerate(temperatures):
+        assert array[index] == snpr.props('P', 'Q', 0, 'T', T)
+
+
+def test_array_calls_coolprop_once_for_missing_states(snpr):
+    calls, states = snpr.coolprop_calls, snpr.coolprop_states
+    snpr.props('P', 'Q', 0, 'T', [400., 450., 400.])
+    snpr.props('P', 'Q', 0, 'T', [400., 450., 500.])
+    assert snpr.coolprop_calls - calls == 2
+    assert snpr.coolprop_states - states == 3
+
+
+def test_small_cache(snpr, monkeypatch):
+    monkeypatch.setattr(snpr, 'cache_maxsize', 3)
+    snpr.props('P', 'Q', 0, 'T', 400.)
+    temperatures = np.linspace(400, 500, 10)
+    result = snpr.props('P', 'Q', 0, 'T', np.append(temperatures, 400.))
+    assert len(snpr._cache) == 3
+    assert result[-1] == result[0]
+    assert np.all(np.diff(result[:-1]) > 0)
+
+
+def test_array_hit_is_refreshed(snpr, monkeypatch):
+    monkeypatch.setattr(snpr, 'cache_maxsize', 2)
+    snpr.props('P', 'Q', 0, 'T', 400.)
+    snpr.props('P', 'Q', 0, 'T', 450.)
+    snpr.props('P', 'Q', 0, 'T', [400.])
+    snpr.props('P', 'Q', 0, 'T', 500.)
+    assert [key[4] for key in snpr._cache] == [400., 500.]
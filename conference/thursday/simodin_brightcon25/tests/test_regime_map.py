@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+
+def test_build_and_predict(model, steam_net_cls, tmp_path):
+    model.params |= {'needed_temperature': 180, 'insulation_thickness': 0.01}
+    regime_map = model.build_regime_map({'pipe_length': (1000, 10000)}, levels=2, depth=2,
+                                        max_workers=2, path=tmp_path / 'map.npz')
+
+    assert len(regime_map) == 4
+    assert regime_map.predict_one({'pipe_length': 1000}) == 'cond_inj'
+    assert regime_map.predict_one({'pipe_length': 10000}) == 'trap'
+    assert regime_map.predict_one({'pipe_length': 20000}) is None
+
+    # the known topology is built directly, without the detection solve, with the same result as a full build
+    metrics = model.instrument()
+    model.calculate_model(pipe_length=10000)
+    assert model.topology == 'trap'
+    assert metrics.to_frame()['stage'].tolist() == ['first', 'third']
+    full = steam_net_cls('steam net')
+    full.init_model(**model.params)
+    full.calculate_model()
+    assert full.topology == 'trap'
+    for col in ['elec_factor', 'boiler_factor', 'losses', 'alloc_ex']:
+        assert getattr(model, col) == pytest.approx(getattr(full, col), rel=1E-6), col
+    loaded = model.use_regime_map(tmp_path / 'map.npz')
+    assert np.array_equal(loaded.labels, regime_map.labels)
+
+
+def test_load_checks_params(steam_net_cls, tmp_path):
+    from steam_net.regime_map import RegimeMap
+
+    model = steam_net_cls('steam net')
+    model.init_model()
+    axes = ['pipe_length']
+    RegimeMap(axes, [0], [1], [[0], [1]], ['plain', 'failed'],
+              RegimeMap.version_key(model.params, axes)).save(tmp_path / 'map.npz')
+
+    regime_map = RegimeMap.load(tmp_path / 'map.npz', model.params)
+    assert regime_map.predict_one({'pipe_length': 1}) is None
+    model.params['Tamb'] += 1
+    with pytest.raises(ValueError, match='other model parameters'):
+        RegimeMap.load(tmp_path / 'map.npz', model.params)
@@ -0,0 +1,73 @@
+import pytest
+
+RESULTS = ['elec_factor', 'boiler_factor', 'losses', 'alloc_ex', 'watertreatment_factor']
+
+
+def solve(model, topology):
+    from tespy.networks import Network
+
+    from steam_net import steam_network_model as snwm
+
+    point = snwm.TOPOLOGY_POINTS[topology]
+    if topology != 'plain':
+        model.calculate_model(**point)
+        return point
+    # the detection solve never selects plain, the network is built with the known topology
+    model.params |= point
+    model._calc_mains()
+    model.model = Network()
+    snwm.create_steam_net(model, 'plain')
+    model._result()
+    model.converged = True
+    model._store_result()
+    return point
+
+
+@pytest.mark.parametrize('topology', ['plain', 'cond_inj', 'trap'])
+def test_store_and_reload(model, steam_net_cls, tmp_path, topology):
+    from steam_net.result_store import StoredNetwork
+
+    store = model.use_result_store(tmp_path)
+    point = solve(model, topology)
+    assert model.topology == topology
+    assert model.params in store
+    amounts = model.flow_amounts()
+
+    loaded = steam_net_cls('loaded')
+    loaded.init_model()
+    loaded.use_result_store(tmp_path)
+    loaded.calculate_model(**point)
+
+    assert isinstance(loaded.model, StoredNetwork)
+    assert loaded.topology == topology
+    for name in RESULTS:
+        assert getattr(loaded, name) == pytest.approx(getattr(model, name), rel=1E-9)
+    for name in ['E_bpt', 'E_hs']:
+        assert getattr(loaded, name).to('W').m == pytest.approx(getattr(model, name).to('W').m, rel=1E-9)
+    assert loaded.flow_amounts() == pytest.approx(amounts, rel=1E-9)
+    assert loaded.model.get_conn('not stored') is None
+
+
+def test_miss(model, tmp_path):
+    store = model.use_result_store(tmp_path)
+    assert store.get(model.params) is None
+    assert model.params not in store
+
+
+@pytest.mark.parametrize('content', [b'', b'PK\x03\x04 truncated'])
+def test_corrupt_file_is_recomputed(model, steam_net_cls, tmp_path, content):
+    from tespy.networks import Network
+
+    store = model.use_result_store(tmp_path)
+    point = solve(model, 'cond_inj')
+    path = store._file(store.key(model.params))
+    path.write_bytes(content)
+    assert store.get(model.params) is None
+
+    other = steam_net_cls('other')
+    other.init_model()
+    other.use_result_store(tmp_path)
+    other.calculate_model(**point)
+    assert isinstance(other.model, Network)
+    assert other.elec_factor == pytest.approx(model.elec_factor, rel=1E-6)
+    assert store.get(model.params) is not None
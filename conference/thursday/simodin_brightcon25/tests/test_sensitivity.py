@@ -0,0 +1,37 @@
+import pytest
+
+OUTPUTS = ['steam generation', 'electricity grid', 'losses', 'boiler_factor']
+
+
+def _outputs(model):
+    return model.flow_amounts() | {'losses': model.losses, 'boiler_factor': model.boiler_factor}
+
+
+def test_sensitivities_match_finite_differences(model, topology_points):
+    point = topology_points['cond_inj']
+    model.calculate_model(**point)
+    base = model.flow_amounts()['steam generation']
+
+    table = model.sensitivities(params=['leakage_factor', 'pipe_length'])
+    assert model.converged
+    assert model.flow_amounts()['steam generation'] == pytest.approx(base, rel=1E-6)
+
+    # central differences of two full solves, leakage_factor moves the boiler mass flow through a Ref
+    params = model.params.copy()
+    for name in ['leakage_factor', 'pipe_length']:
+        step = 0.01 * params[name]
+        model.calculate_model(**point | {name: params[name] + step})
+        upper = _outputs(model)
+        model.calculate_model(**point | {name: params[name] - step})
+        lower = _outputs(model)
+        for output in OUTPUTS:
+            finite = (upper[output] - lower[output]) / (2 * step)
+            assert table.loc[output, name] == pytest.approx(finite, rel=1E-3), (name, output)
+
+
+def test_tespy_version_guard(model, monkeypatch):
+    import tespy
+
+    monkeypatch.setattr(tespy, '__version__', '1.0.0')
+    with pytest.raises(RuntimeError, match='internals of TESPy'):
+        model.sensitivities()
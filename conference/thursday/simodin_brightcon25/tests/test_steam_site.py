@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+CONSUMERS = [
+    {'name': 'dryer', 'heat': 3E6, 'needed_temperature': 150, 'pipe_length': 500, 'insulation_thickness': 0.1},
+    {'name': 'press', 'heat': 2E6, 'needed_temperature': 155, 'pipe_length': 800, 'insulation_thickness': 0.1},
+    {'name': 'reactor', 'heat': 5E6, 'needed_temperature': 180, 'pipe_length': 300, 'insulation_thickness': 0.1},
+    ]
+# two segments, the paper machines share the 8 bar main with the direct consumers, the evaporator lifts the
+# kiln line to the 16 bar main:
+SEGMENTS = [
+    {'name': 'paper 1', 'heat': 1E6, 'needed_temperature': 150, 'pipe_length': 100, 'insulation_thickness': 0.1,
+     'segment': 'paper line', 'segment_length': 600},
+    {'name': 'paper 2', 'heat': 1.5E6, 'needed_temperature': 145, 'pipe_length': 150, 'insulation_thickness': 0.1,
+     'segment': 'paper line', 'segment_length': 600},
+    {'name': 'kiln', 'heat': 2E6, 'needed_temperature': 150, 'pipe_length': 200, 'insulation_thickness': 0.1,
+     'segment': 'kiln line', 'segment_length': 400, 'segment_insulation_thickness': 0.05},
+    {'name': 'evaporator', 'heat': 1E6, 'needed_temperature': 175, 'pipe_length': 100, 'insulation_thickness': 0.1,
+     'segment': 'kiln line', 'segment_length': 400, 'segment_insulation_thickness': 0.05},
+    ]
+
+
+def _losses(site, name, row):
+    '''Heat lost in the pipes of a consumer and its share of the shared segment and of the steam leak.'''
+    network = site.networks[row['main']]
+    loss = -(network.get_comp(f'steam pipe {name}').Q.val_SI + network.get_comp(f'condensate pipe {name}').Q.val_SI)
+    if pd.notna(row['segment']):
+        segment = row['segment']
+        loss -= (row['steam_mass_flow'] / network.get_conn(f'g1 {segment}').m.val_SI
+                 * (network.get_comp(f'steam segment {segment}').Q.val_SI
+                    + network.get_comp(f'condensate segment {segment}').Q.val_SI))
+    c_leak = network.get_conn('c_leak')
+    leak = c_leak.m.val_SI * (c_leak.h.val_SI - network.get_conn('muw2').h.val_SI)
+    return loss + leak * row['share']
+
+
+@pytest.fixture
+def site():
+    pytest.importorskip('tespy')
+    pytest.importorskip('simodin')
+    from steam_net.steam_site_interface import steam_site
+    site = steam_site('site')
+    site.init_model(init_arg=CONSUMERS)
+    yield site
+    site.uninstrument()
+
+
+def test_site(site):
+    metrics = site.instrument()
+    site.calculate_model()
+
+    results = site.consumer_results
+    assert site.converged
+    assert sorted(results['main'].unique()) == [8, 16]
+    assert sorted(metrics.to_frame()['stage']) == ['main 16', 'main 8']
+    assert results['allocationfactor'].sum() == pytest.approx(1)
+    for name, row in results.iterrows():
+        assert row['losses'] == pytest.approx(_losses(site, name, row) / row['heat'], rel=1E-9)
+    # pipe losses and leak add up
+    row = results.loc['dryer']
+    network = site.networks[row['main']]
+    assert -network.get_comp('steam pipe dryer').Q.val_SI > 0
+    assert row['losses'] * row['heat'] > -network.get_comp('steam pipe dryer').Q.val_SI
+
+
+def test_site_segments(steam_net_cls):
+    from steam_net.steam_site_interface import steam_site
+
+    site = steam_site('site')
+    site.init_model(init_arg=CONSUMERS + SEGMENTS)
+    site.calculate_model()
+
+    results = site.consumer_results
+    assert site.converged
+    assert len(results) == 7
+    assert results.loc[['paper 1', 'paper 2', 'dryer', 'press'], 'main'].tolist() == [8] * 4
+    # the kiln needs 8 bar, but shares its line with the evaporator on the 16 bar main
+    assert results.loc[['kiln', 'evaporator', 'reactor'], 'main'].tolist() == [16] * 3
+    network = site.networks[8]
+    segment = network.get_conn('g1 paper line').m.val_SI
+    assert segment == pytest.approx(results.loc[['paper 1', 'paper 2'], 'steam_mass_flow'].sum())
+    assert site.main_amounts[8]['distributed steam paper 2'] == pytest.approx(1.5)
+    for name, row in results.iterrows():
+        assert row['losses'] == pytest.approx(_losses(site, name, row) / row['heat'], rel=1E-9)
+    assert results['allocationfactor'].sum() == pytest.approx(1)
+
+
+def test_check_segments(steam_net_cls):
+    from steam_net.steam_site_interface import steam_site
+
+    site = steam_site('site')
+    with pytest.raises(ValueError, match='segment_length'):
+        site.init_model(init_arg=[c | {'segment_length': c['segment_length'] + i} for i, c in enumerate(SEGMENTS)])
+    with pytest.raises(ValueError, match='segment_length'):
+        site.init_model(init_arg=[{k: v for k, v in c.items() if k != 'segment_length'} for c in SEGMENTS])
+
+
+def test_consumer_impacts(site, monkeypatch):
+    from steam_net import bw_link
+
+    site.calculate_model()
+    site.define_flows()
+    monkeypatch.setattr(bw_link, 'unit_factors', lambda interface: {name: 1.0 for name in site._technosphere})
+    monkeypatch.setattr(bw_link, 'impact_scores', lambda interface, amounts, factors: {'GWP': sum(amounts.values())})
+
+    impacts = site.consumer_impacts(object())
+    results = site.consumer_results
+    total = sum(amount for main in site.main_amounts.values() for flow, amount in main.items()
+                if not flow.startswith('distributed steam'))
+    # the same allocation key as the distributed steam products of define_flows()
+    for name, row in results.iterrows():
+        assert site._technosphere[f'distributed steam {name}'].allocationfactor == row['allocationfactor']
+        steam = site.main_amounts[row['main']][f'distributed steam {name}']
+        assert impacts.loc[name, 'GWP'] * steam == pytest.approx(total * row['allocationfactor'])
@@ -0,0 +1,42 @@
+import pytest
+
+
+@pytest.fixture
+def points():
+    # all points are served by the 16 bar main
+    return {'needed_temperature': [176, 180, 184, 188, 192, 196, 200]}
+
+
+def test_predict_needs_surrogate(model):
+    with pytest.raises(ValueError, match='fit_surrogate'):
+        model.predict({'needed_temperature': [190]})
+
+
+def test_fit_predict_save_load(model, points, tmp_path):
+    from steam_net.surrogate import SteamNetSurrogate
+
+    path = tmp_path / 'surrogate.npz'
+    surrogate = model.fit_surrogate(points, holdout=0, max_workers=2, path=path)
+    assert surrogate.topologies == ['cond_inj']
+
+    predicted = model.predict({'needed_temperature': [190, 220]}, max_workers=1)
+    assert predicted['surrogate'].tolist() == [True, False]
+    model.calculate_model(needed_temperature=190)
+    assert predicted.loc[0, 'elec_factor'] == pytest.approx(model.elec_factor, rel=1E-2)
+    model.calculate_model(needed_temperature=220)
+    assert predicted.loc[1, 'elec_factor'] == pytest.approx(model.elec_factor, rel=1E-6)
+
+    # the only point outside of the bounds fails
+    failed = model.predict({'needed_temperature': [400]}, max_workers=1)
+    assert failed['surrogate'].tolist() == [False]
+    assert failed[surrogate.outputs].isna().all(axis=None)
+
+    loaded = SteamNetSurrogate.load(path, model.params)
+    assert loaded.predict_one(needed_temperature=190) == pytest.approx(surrogate.predict_one(needed_temperature=190))
+    with pytest.raises(ValueError, match='other model parameters'):
+        SteamNetSurrogate.load(path, model.params | {'max_pressure': 100})
+
+
+def test_too_few_training_points_after_holdout(model, points):
+    with pytest.raises(ValueError, match='after the holdout'):
+        model.fit_surrogate(points, holdout=0.9, max_workers=2)
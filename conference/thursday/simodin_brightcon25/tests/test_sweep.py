@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+
+def test_params_hash_normalizes_numbers():
+    pytest.importorskip('tespy')
+    from steam_net.steam_network_model import params_hash
+
+    base = {'mains': [4, 10], 'heat': 40E6, 'environment_media': 'air'}
+    assert params_hash(base) == params_hash(base | {'mains': [4.0, 10.0]})
+    assert params_hash(base) == params_hash(base | {'mains': np.array([4, 10]), 'heat': np.float64(40E6)})
+    assert params_hash(base) != params_hash(base | {'mains': [4, 12]})
+
+
+def test_parameter_grid():
+    pytest.importorskip('pandas')
+    from steam_net.sweep import parameter_grid
+
+    grid = parameter_grid(needed_temperature=[150, 200], pipe_length=[100, 500, 1000])
+    assert len(grid) == 6
+    assert list(grid.columns) == ['needed_temperature', 'pipe_length']
+
+
+def test_run_sweep(model, topology_points):
+    from steam_net.sweep import RESULT_COLUMNS
+
+    points = [{'needed_temperature': 150}, topology_points['cond_inj'], {'needed_temperature': 400}]
+    results = model.sweep(points, max_workers=2)
+
+    assert list(results.index) == [0, 1, 2]
+    assert results['converged'].tolist() == [True, True, False]
+    assert results['topology'].tolist()[:2] == ['cond_inj', 'cond_inj']
+    assert results.loc[2, 'error']
+    for col in RESULT_COLUMNS:
+        assert np.isfinite(results.loc[:1, col]).all()
+
+    model.calculate_model(**topology_points['cond_inj'])
+    assert results.loc[1, 'elec_factor'] == pytest.approx(model.elec_factor, rel=1E-6)
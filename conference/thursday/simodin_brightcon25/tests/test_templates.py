@@ -0,0 +1,47 @@
+import pytest
+
+
+def test_templates_are_opt_in(model):
+    from steam_net.templates import template_cache
+
+    cached = len(template_cache)
+    model.calculate_model(needed_temperature=180)
+    network = model.model
+    model.calculate_model(needed_temperature=170)
+
+    assert model.templates is None
+    assert model.model is not network
+    assert len(template_cache) == cached
+    assert network.converged
+
+
+def test_solve_from_template(model, steam_net_cls):
+    cache = model.use_templates()
+    model.calculate_model(needed_temperature=180)
+    network = model.model
+
+    model.topology_hint = 'cond_inj'
+    model.calculate_model(needed_temperature=170)
+    assert cache.hits == 1
+    assert model.model is network
+    assert model.topology == 'cond_inj'
+
+    cold = steam_net_cls('cold')
+    cold.init_model()
+    cold.calculate_model(needed_temperature=170)
+    for name in ['elec_factor', 'boiler_factor', 'losses', 'alloc_ex']:
+        assert getattr(model, name) == pytest.approx(getattr(cold, name), rel=1E-5)
+
+
+def test_cache_eviction():
+    pytest.importorskip('tespy')
+    from steam_net.templates import TemplateCache
+
+    cache = TemplateCache(maxsize=2)
+    networks = [object() for _ in range(3)]
+    for network in networks:
+        cache.put(('cond_inj', 'air'), network)
+    assert len(cache) == 2
+    assert cache.pop(('cond_inj', 'air')) is networks[2]
+    assert cache.pop(('trap', 'air')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
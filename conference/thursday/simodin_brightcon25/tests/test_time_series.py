@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+
+def test_time_series(model, topology_points):
+    model.params |= topology_points['cond_inj']
+    heat = model.params['heat']
+    result = model.time_series(heat=[heat, 0.8 * heat], Tamb=15)
+
+    assert result.converged.all()
+    steam = result.columns['distributed steam']
+    assert steam[1] < steam[0]
+    assert result.aggregates()['timesteps'] == 2
+    # the model is solved again at its design params
+    assert model.converged
+    assert model.params['heat'] == heat
+
+
+def test_time_series_error(model, monkeypatch, tmp_path, topology_points):
+    import tempfile
+
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    model.params |= topology_points['cond_inj']
+    heat = model.params['heat']
+    recalculated = []
+    monkeypatch.setattr(model, 'recalculate_model', lambda: recalculated.append(True))
+    monkeypatch.setattr(model, 'flow_amounts', lambda: 1 / 0)
+
+    with pytest.raises(ZeroDivisionError):
+        model.time_series(heat=[heat, 0.8 * heat])
+    # the design file is removed and the network is not solved while the error propagates
+    assert list(tmp_path.iterdir()) == []
+    assert not recalculated
+    assert not model.converged
+    assert model.params['heat'] == heat
+
+
+def test_time_series_bad_timestep(model, monkeypatch, topology_points):
+    model.params |= topology_points['cond_inj']
+    heat = model.params['heat']
+    original = model._result
+
+    def failing_result():
+        if model.params['heat'] == 0.9 * heat:
+            raise ZeroDivisionError('no result')
+        original()
+    monkeypatch.setattr(model, '_result', failing_result)
+    result = model.time_series(heat=[heat, 0, 0.9 * heat, 0.8 * heat])
+
+    # the timestep without heat demand and the one without result fail, the others are still evaluated
+    assert result.converged.tolist() == [True, False, False, True]
+    assert np.isnan(result.columns['losses'][1:3]).all()
+    assert not np.isnan(result.columns['losses'][3])
+    assert result.aggregates()['converged'] == 2
+    assert model.converged
@@ -0,0 +1,37 @@
+import pytest
+
+
+def first_iterations(metrics):
+    return [r['iterations'] for r in metrics.records if r['stage'] == 'first']
+
+
+def test_nearest_state(model):
+    from steam_net.warm_start import SolutionIndex
+
+    model.calculate_model(needed_temperature=180)
+    index = SolutionIndex()
+    assert index.nearest(model.params, 'cond_inj') is None
+    index.add(model.params, model.model, 'cond_inj')
+    state = index.nearest(model.params | {'needed_temperature': 150})
+    assert state is index.nearest(model.params, 'cond_inj')
+    assert index.nearest(model.params, 'trap') is None
+    assert state['comps']['steam pipe']['D'] == pytest.approx(model.model.get_comp('steam pipe').D.val)
+
+
+def test_warm_started_build(steam_net_cls):
+    cold = steam_net_cls('cold')
+    cold.init_model()
+    cold_metrics = cold.instrument()
+    warm = steam_net_cls('warm')
+    warm.init_model()
+    warm.enable_warm_start()
+    warm_metrics = warm.instrument()
+
+    for needed_temperature in [180, 170]:
+        cold.calculate_model(needed_temperature=needed_temperature)
+        warm.calculate_model(needed_temperature=needed_temperature)
+
+    assert len(warm.solutions) == 2
+    assert first_iterations(warm_metrics)[1] < first_iterations(cold_metrics)[1]
+    for name in ['elec_factor', 'boiler_factor', 'losses', 'alloc_ex']:
+        assert getattr(warm, name) == pytest.approx(getattr(cold, name), rel=1E-5)
@@ -0,0 +1,43 @@
+'''Small IO system in the BONSAI file format for the tests.'''
+import json
+
+import numpy as np
+import pandas as pd
+
+# small IO system: production on the diagonal, inputs negative
+TECHNOSPHERE = np.array([
+    [1.0, -0.5, 0.0],
+    [0.0, 2.0, -0.2],
+    [-0.1, 0.0, 1.0],
+    ])
+EXTENSIONS = np.array([
+    [2.0, 1.0, 0.0],
+    [0.0, 0.0, 3.0],
+    ])
+FLOWS = ['Carbon_dioxide__fossil_Air', 'Methane_Air']
+
+
+def _triplets(matrix, path):
+    rows, cols = np.nonzero(matrix)
+    pd.DataFrame({'row': rows, 'col': cols, 'amount': matrix[rows, cols]}).to_csv(
+        path, compression='gzip', index=False)
+
+
+def write_tables(dirpath):
+    '''Write the BONSAI files of the small IO system to dirpath.'''
+    pd.DataFrame({
+        'col_region': ['AT', 'AT', 'DE'],
+        'col_code': ['A_STEEL', 'A_CARS', 'A_STEEL'],
+        'row_region': ['AT', 'AT', 'DE'],
+        'row_code': ['C_STEEL', 'C_CARS', 'C_STEEL'],
+        }).to_csv(dirpath / 'index_table_hiot.gzip', compression='gzip', index=False)
+    pd.DataFrame({'row_code': FLOWS}).to_csv(dirpath / 'index_table_extensions.gzip', compression='gzip', index=False)
+    _triplets(TECHNOSPHERE, dirpath / 'product_value_table.gzip')
+    _triplets(EXTENSIONS, dirpath / 'extensions_value_table.gzip')
+    with open(dirpath / 'io_metadata.json', 'w') as f:
+        json.dump({
+            'A_STEEL': {'name': 'production of steel', 'unit': 'tonne'},
+            'C_STEEL': {'name': 'steel', 'unit': 'tonne'},
+            'A_CARS': {'name': 'production of cars', 'unit': 'item'},
+            'C_CARS': {'name': 'cars', 'unit': 'item'},
+            }, f)
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bonsai_tables import write_tables  # noqa: E402
+
+
+@pytest.fixture
+def bonsai_dir(tmp_path):
+    '''Directory with BONSAI files of a small IO system.'''
+    dirpath = tmp_path / 'bonsai_files'
+    dirpath.mkdir()
+    write_tables(dirpath)
+    return dirpath
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from bonsai_lca import BatchLCA
+from bonsai_matrices import BonsaiMatrices
+from bonsai_tables import EXTENSIONS, FLOWS, TECHNOSPHERE
+
+CHARACTERIZATION = {
+    'GWP100': {'Carbon_dioxide__fossil_Air': 1, 'Methane_Air': 28},
+    'CH4': {'Methane_Air': 1, 'not in the table': 5},
+    }
+
+
+@pytest.fixture
+def lca(bonsai_dir, tmp_path):
+    return BatchLCA(BonsaiMatrices.load(bonsai_dir, tmp_path / 'cache'), CHARACTERIZATION)
+
+
+def test_scores(lca):
+    keys = ['A_STEEL|AT', 'A_CARS|AT', 'A_STEEL|DE']
+    scores = lca.scores(lca.demands(keys, [1, 2, 3]))
+
+    C = np.array([[1, 28], [0, 1]])
+    expected = C @ EXTENSIONS @ np.linalg.solve(TECHNOSPHERE, np.diag([1, 2, 3]))
+    assert list(scores.index) == keys
+    assert list(scores.columns) == ['GWP100', 'CH4']
+    assert np.allclose(scores.to_numpy(), expected.T)
+
+
+@pytest.mark.parametrize('by', ['flow', 'location'])
+def test_contributions(lca, by):
+    demands = lca.demands(['A_STEEL|AT', 'A_CARS|AT', 'A_STEEL|DE'])
+    contributions = lca.contributions(demands, 'GWP100', by=by, chunksize=2)
+
+    assert list(contributions.index) == (FLOWS if by == 'flow' else ['AT', 'DE'])
+    assert np.allclose(contributions.sum().to_numpy(), lca.scores(demands)['GWP100'].to_numpy())
+
+
+def test_contributions_by_unknown(lca):
+    with pytest.raises(ValueError, match='by must be'):
+        lca.contributions(lca.demands(['A_CARS|AT']), 'GWP100', by='sector')
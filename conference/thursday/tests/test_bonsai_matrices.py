@@ -0,0 +1,37 @@
+import numpy as np
+
+from bonsai_matrices import BonsaiMatrices
+from bonsai_tables import EXTENSIONS, FLOWS, TECHNOSPHERE
+
+
+def test_build_and_cache(bonsai_dir, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    bonsai = BonsaiMatrices.load(bonsai_dir, cache_dir)
+
+    assert np.allclose(bonsai.technosphere.toarray(), TECHNOSPHERE)
+    assert np.allclose(bonsai.extensions.toarray(), EXTENSIONS)
+    assert list(bonsai.flows) == FLOWS
+    assert bonsai.index('A_STEEL|DE') == 2
+    assert bonsai.activity('A_CARS|AT') == {
+        'key': 'A_CARS|AT', 'code': 'A_CARS', 'location': 'AT', 'name': 'production of cars',
+        'unit': 'item', 'product_key': 'C_CARS|AT', 'product_name': 'cars'}
+    assert list(bonsai.find(name='production of steel')['location']) == ['AT', 'DE']
+    assert BonsaiMatrices.cache_valid(bonsai_dir, cache_dir)
+
+    # the cached matrix values are read only memory maps
+    cached = BonsaiMatrices.load(bonsai_dir, cache_dir)
+    assert not cached.technosphere.data.flags.writeable
+    assert np.allclose(cached.technosphere.toarray(), TECHNOSPHERE)
+
+
+def test_rebuild_on_source_change(bonsai_dir, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    BonsaiMatrices.load(bonsai_dir, cache_dir)
+    with open(bonsai_dir / 'io_metadata.json') as f:
+        text = f.read()
+    with open(bonsai_dir / 'io_metadata.json', 'w') as f:
+        f.write(text.replace('production of cars', 'manufacture of cars'))
+
+    assert not BonsaiMatrices.cache_valid(bonsai_dir, cache_dir)
+    bonsai = BonsaiMatrices.load(bonsai_dir, cache_dir)
+    assert bonsai.activity('A_CARS|AT')['name'] == 'manufacture of cars'
@@ -1,21 +1,105 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
 
 import bw2data as bd
 import bw2io as bi
 
 NAME_PROJECT='workshop-bw25'
+ECOINVENT_VERSION='3.10.1'
+SYSTEM_MODEL='cutoff'
+BIOSPHERE=f'ecoinvent-{ECOINVENT_VERSION}-biosphere'
 
-#Open a brightway project associated with the project name chosen
-bd.projects.set_current(NAME_PROJECT)
+# Directory of the validated project snapshots, shared by CI and batch workers:
+SNAPSHOT_DIR=Path(os.environ.get('BW_SNAPSHOT_DIR', Path.home() / 'brightway-snapshots'))
 
-bi.import_ecoinvent_release(
-        version="3.10.1",
-        system_model="cutoff",
-        use_mp=True
-        #username="XX",
-        #password="yy"
-        )
 
-# For those that have a valid ecoinvent license, you can simply restore a project with:
+def snapshot_name(project, version, system_model, biosphere):
+    '''Name of the snapshots of the project with this ecoinvent release.'''
+    return f'{project}-ecoinvent-{version}-{system_model}-{biosphere}'
 
-# bi.restore_project_directory("/srv/data/brightway2-project-workshop-bw25-backup13-October-2025-05-30PM.tar.gz", overwrite_existing=True)
 
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def find_snapshot(name):
+    '''Newest snapshot <name>-<sha256>.tar.gz, whose content matches the checksum in its file name.
+
+    Returns the path of the snapshot and the paths of the snapshots, which did not match their checksum.
+    '''
+    pattern = re.compile(re.escape(name) + r'-([0-9a-f]{64})\.tar\.gz')
+    candidates = [path for path in SNAPSHOT_DIR.glob(f'{name}-*.tar.gz') if pattern.fullmatch(path.name)]
+    invalid = []
+    for path in sorted(candidates, key=lambda path: path.stat().st_mtime, reverse=True):
+        if sha256(path) == pattern.fullmatch(path.name).group(1):
+            return path, invalid
+        invalid.append(path)
+    return None, invalid
+
+
+def save_snapshot(project, name):
+    '''Backup the project as compressed snapshot <name>-<sha256>.tar.gz and return its path.
+
+    The backup is written to a private temporary directory next to the snapshots and moved into
+    place with one os.replace() under the name with its own checksum. Parallel workers never see
+    partial files and a snapshot can not be paired with the checksum of another one.
+    '''
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=SNAPSHOT_DIR, prefix='.snapshot-'))
+    try:
+        backup = bi.backup_project_directory(project, timestamp=False, dir_backup=tmp_dir)
+        path = SNAPSHOT_DIR / f'{name}-{sha256(backup)}.tar.gz'
+        os.replace(backup, path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return path
+
+
+def provision(project=NAME_PROJECT, version=ECOINVENT_VERSION, system_model=SYSTEM_MODEL, biosphere=BIOSPHERE):
+    '''
+    Set up the project with the ecoinvent release. An existing project is used as is, a validated
+    snapshot is restored, otherwise ecoinvent is imported and the project is saved as new snapshot.
+    '''
+    database = f'ecoinvent-{version}-{system_model}'
+    if project in bd.projects:
+        bd.projects.set_current(project)
+        if database in bd.databases and biosphere in bd.databases:
+            print(f'Project {project} with {database} exists.')
+            return
+
+    name = snapshot_name(project, version, system_model, biosphere)
+    path, invalid = find_snapshot(name)
+    for broken in invalid:
+        print(f'Snapshot {broken} does not match its checksum.')
+    if path is not None:
+        print(f'Restore project {project} from snapshot {path}.')
+        bi.restore_project_directory(path, project_name=project, overwrite_existing=True, switch=True)
+        return
+
+    #Open a brightway project associated with the project name chosen
+    bd.projects.set_current(project)
+    bi.import_ecoinvent_release(
+            version=version,
+            system_model=system_model,
+            biosphere_name=biosphere,
+            use_mp=True
+            #username="XX",
+            #password="yy"
+            )
+    path = save_snapshot(project, name)
+    print(f'Saved snapshot {path}.')
+
+
+provision()
+
+# For those that have a valid ecoinvent license, you can also restore a project by hand with:
+
+# bi.restore_project_directory("/srv/data/brightway2-project-workshop-bw25-backup13-October-2025-05-30PM.tar.gz", overwrite_existing=True)